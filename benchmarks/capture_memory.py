@@ -0,0 +1,69 @@
+import asyncio
+import tracemalloc
+from typing import Callable, Dict, Union
+
+import fire
+
+import dony
+from timing import report
+
+
+def peak_memory_mb(
+    command: str, capture_output: Callable[[], Union[bool, dony.Capture]]
+) -> float:
+    """Peak Python heap allocation while running the command, in MB."""
+
+    async def run():
+        await dony.shell(
+            command,
+            quiet=True,
+            capture_output=capture_output(),
+            show_command=False,
+        )
+
+    tracemalloc.start()
+    try:
+        asyncio.run(run())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def benchmark(megabytes: int = 100) -> Dict[str, float]:
+    """Peak memory of `dony.shell` with each capture strategy.
+
+    Args:
+        megabytes: Output size of the command.
+    """
+
+    command = f"head -c {megabytes * 1024 * 1024} /dev/zero | tr '\\0' 'x'"
+
+    def file_capture() -> dony.FileCapture:
+        capture = dony.FileCapture()
+        captures.append(capture)
+        return capture
+
+    captures = []
+    try:
+        return {
+            f"{name}_peak_mb": peak_memory_mb(command, capture_output)
+            for name, capture_output in [
+                ("no_capture", lambda: False),
+                ("memory", lambda: True),
+                ("tail", lambda: dony.TailCapture()),
+                ("head_tail", lambda: dony.HeadTailCapture()),
+                ("file", file_capture),
+            ]
+        }
+    finally:
+        for capture in captures:
+            capture.delete()
+
+
+def main(megabytes: int = 100) -> None:
+    report(benchmark(megabytes=megabytes))
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
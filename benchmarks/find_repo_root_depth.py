@@ -0,0 +1,57 @@
+import os
+import subprocess
+import tempfile
+from typing import Dict
+
+import fire
+
+import dony
+from dony.find_repo_root import cache_clear
+from timing import best_of, report
+
+
+def benchmark(depth: int = 50, lookups: int = 1000, runs: int = 5) -> Dict[str, float]:
+    """`dony.find_repo_root` from a directory `depth` levels below the repo root.
+
+    Args:
+        depth: Nesting depth of the start directory.
+        lookups: Lookups per run.
+        runs: Runs per case, the best one is reported.
+    """
+
+    with tempfile.TemporaryDirectory() as root:
+        subprocess.run(["git", "init", "-q", root], check=True)
+        deep = os.path.join(root, *(f"d{i}" for i in range(depth)))
+        os.makedirs(deep)
+        siblings = [os.path.join(deep, f"s{i}") for i in range(lookups)]
+        for sibling in siblings:
+            os.mkdir(sibling)
+
+        def cold():
+            # Every lookup walks the whole way up
+            for _ in range(lookups):
+                cache_clear()
+                dony.find_repo_root(deep)
+
+        def warm():
+            dony.find_repo_root(deep)
+            for _ in range(lookups):
+                dony.find_repo_root(deep)
+
+        def many():
+            # Siblings share the walk above them
+            cache_clear()
+            dony.find_repo_roots(siblings)
+
+        return {
+            f"{name}_us_per_lookup": best_of(case, runs=runs) / lookups * 1e6
+            for name, case in [("cold", cold), ("warm", warm), ("many", many)]
+        }
+
+
+def main(depth: int = 50, lookups: int = 1000, runs: int = 5) -> None:
+    report(benchmark(depth=depth, lookups=lookups, runs=runs))
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
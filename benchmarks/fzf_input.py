@@ -0,0 +1,52 @@
+import shutil
+from typing import Dict, List, Sequence, Union
+
+import fire
+
+from dony.prompts.fzf import run_fzf
+from dony.prompts.select import Choice, fzf_line
+from timing import best_of, best_of_async, report
+
+
+def benchmark(choices: int = 100_000, runs: int = 5) -> Dict[str, float]:
+    """Building the fzf input of `dony.select`/`dony.select_many` for many choices.
+
+    With fzf installed, also measures streaming it into `fzf --filter` (non-interactive).
+
+    Args:
+        choices: Number of choices.
+        runs: Runs per case, the best one is reported.
+    """
+
+    strings = [f"service-{i}" for i in range(choices)]
+    described: List[Union[str, Choice]] = [
+        Choice(f"service-{i}", short_desc="running", long_desc=f"Service number {i}")
+        for i in range(choices)
+    ]
+
+    def build(items: Sequence[Union[str, Choice]]) -> None:
+        for index, item in enumerate(items):
+            fzf_line(index, item)
+
+    results = {
+        "build_strings_ms": best_of(lambda: build(strings), runs=runs) * 1000,
+        "build_choices_ms": best_of(lambda: build(described), runs=runs) * 1000,
+    }
+
+    if shutil.which("fzf"):
+
+        async def stream():
+            lines = (fzf_line(index, item) for index, item in enumerate(described))
+            await run_fzf(["--filter", f"service-{choices - 1}"], lines)
+
+        results["stream_to_fzf_ms"] = best_of_async(stream, runs=runs) * 1000
+
+    return results
+
+
+def main(choices: int = 100_000, runs: int = 5) -> None:
+    report(benchmark(choices=choices, runs=runs))
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
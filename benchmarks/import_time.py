@@ -0,0 +1,97 @@
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+import fire
+
+HEAVY_MODULES = ("questionary", "prompt_toolkit")
+
+# What a script that only runs commands does: import, then a default `dony.shell` call,
+# which shows the command
+STATEMENTS = {
+    "import_dony_ms": "import dony; dony.shell",
+    "first_shell_ms": "import dony; asyncio.run(dony.shell('true'))",
+}
+
+# Written by `just bench_save`
+BASELINE = Path(__file__).resolve().parent.parent / "bench_baseline.json"
+
+
+def measure_import_time(statement: str = "import dony; dony.shell") -> Dict[str, int]:
+    """Run `statement` in a fresh interpreter with `-X importtime`.
+
+    Returns cumulative import time in microseconds per module, and the total of the modules
+    imported from `import dony` on (also lazily, by the calls) as "total". asyncio is imported
+    first, so that its cost (paid by every asyncio script anyway) is not attributed to dony.
+    """
+
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import asyncio; {statement}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+
+    times = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative)
+        # Top-level imports are not indented, nested ones are counted in their parent
+        if "dony" in times and not module.startswith("  "):
+            total += int(cumulative)
+    times["total"] = total
+    return times
+
+
+def benchmark(runs: int = 5) -> Dict[str, float]:
+    """Import time of `dony`, alone and with a first `dony.shell` call, best of `runs` fresh interpreters."""
+    return {
+        name: min(measure_import_time(statement)["total"] for _ in range(runs)) / 1000
+        for name, statement in STATEMENTS.items()
+    }
+
+
+def import_time(
+    budget_ms: Optional[float] = None,
+    baseline: str = str(BASELINE),
+    tolerance: float = 0.2,
+    runs: int = 5,
+) -> None:
+    """Check that importing dony and a first `dony.shell` call stay within budget and don't load prompt_toolkit.
+
+    Args:
+        budget_ms: Maximum import time of each statement, best of `runs`. Defaults to the
+                   baseline plus `tolerance`, or to 150ms without a baseline.
+        baseline: Results saved by `run_all.py --save` (`just bench_save`).
+        tolerance: Allowed relative regression over the baseline, 0.2 = 20%.
+        runs: Number of fresh interpreters to measure.
+    """
+
+    import json
+
+    saved = json.loads(Path(baseline).read_text()) if Path(baseline).exists() else {}
+
+    for name, statement in STATEMENTS.items():
+        # - Measure
+
+        measurements = [measure_import_time(statement) for _ in range(runs)]
+        best_ms = min(times["total"] for times in measurements) / 1000
+        budget = budget_ms
+        if budget is None:
+            base = saved.get(f"import_time.{name}")
+            budget = base * (1 + tolerance) if base else 150
+        print(f"{statement}: {best_ms:.1f}ms (budget {budget:.0f}ms)")
+
+        # - Check
+
+        loaded = [module for module in HEAVY_MODULES if module in measurements[0]]
+        assert not loaded, f"`{statement}` loads {', '.join(loaded)}"
+        assert best_ms <= budget, f"`{statement}` took {best_ms:.1f}ms > {budget:.0f}ms"
+
+
+if __name__ == "__main__":
+    fire.Fire(import_time)
@@ -0,0 +1,81 @@
+import json
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Union
+
+import fire
+
+import capture_memory
+import find_repo_root_depth
+import fzf_input
+import import_time
+import shell_overhead
+import shell_throughput
+from timing import report
+
+BENCHMARKS = {
+    "import_time": import_time.benchmark,
+    "shell_overhead": shell_overhead.benchmark,
+    "shell_throughput": shell_throughput.benchmark,
+    "capture_memory": capture_memory.benchmark,
+    "find_repo_root_depth": find_repo_root_depth.benchmark,
+    "fzf_input": fzf_input.benchmark,
+}
+
+
+def run_all(
+    only: Optional[Union[str, Sequence[str]]] = None,
+    save: Optional[str] = None,
+    compare: Optional[str] = None,
+    tolerance: float = 0.2,
+) -> None:
+    """Run the benchmarks of dony's hot paths.
+
+    Args:
+        only: Comma-separated benchmark names to run (default: all).
+        save: Writes the results to this JSON file, to be used as a baseline later.
+        compare: Compares against a baseline JSON file and fails on regressions.
+        tolerance: Allowed relative regression, 0.2 = 20%.
+    """
+
+    # - Run
+
+    if only is None:
+        names = list(BENCHMARKS)
+    elif isinstance(only, str):
+        names = only.split(",")
+    else:
+        names = list(only)  # fire parses "a,b" into a tuple
+    results: Dict[str, float] = {}
+    for name in names:
+        print(f"# {name}")
+        benchmark_results = {
+            f"{name}.{key}": value for key, value in BENCHMARKS[name]().items()
+        }
+        report(benchmark_results)
+        results.update(benchmark_results)
+
+    if save:
+        Path(save).write_text(json.dumps(results, indent=2) + "\n")
+
+    # - Compare with the baseline. Throughputs (`_s` suffix, per second) regress when they drop, the rest when they grow
+
+    if compare:
+        baseline = json.loads(Path(compare).read_text())
+        regressions = []
+        for key, value in results.items():
+            if key not in baseline or not baseline[key]:
+                continue
+            change = value / baseline[key] - 1
+            if key.endswith("_s"):
+                change = -change
+            if change > tolerance:
+                regressions.append(
+                    f"{key}: {baseline[key]:.2f} -> {value:.2f} ({change:+.0%})"
+                )
+
+        assert not regressions, "Regressions:\n" + "\n".join(regressions)
+        print(f"No regressions above {tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    fire.Fire(run_all)
@@ -0,0 +1,58 @@
+from typing import Dict
+
+import fire
+
+import dony
+from timing import best_of_async, report
+
+
+def benchmark(commands: int = 50, runs: int = 3) -> Dict[str, float]:
+    """Per-command overhead of `dony.shell` on a trivial command.
+
+    Args:
+        commands: Commands per run.
+        runs: Runs per case, the best one is reported.
+    """
+
+    # - Cases: output is quiet, so that only dony's own work and the process spawn are measured
+
+    async def plain():
+        for _ in range(commands):
+            await dony.shell("true", quiet=True, show_command=False)
+
+    async def formatted_cached():
+        # Same command every time: shfmt runs once, then the formatting cache is hit
+        for _ in range(commands):
+            await dony.shell("true", quiet=True, show_command=True)
+
+    async def formatted_uncached():
+        # A different command every time: shfmt runs for each one (if installed)
+        for i in range(commands):
+            await dony.shell(
+                f"true # {id(object())} {i}", quiet=True, show_command=True
+            )
+
+    async def session():
+        async with dony.Session() as session:
+            for _ in range(commands):
+                await session.shell("true", quiet=True, show_command=False)
+
+    # - Measure
+
+    return {
+        f"{name}_ms_per_command": best_of_async(case, runs=runs) / commands * 1000
+        for name, case in [
+            ("plain", plain),
+            ("show_command_cached", formatted_cached),
+            ("show_command_uncached", formatted_uncached),
+            ("session", session),
+        ]
+    }
+
+
+def main(commands: int = 50, runs: int = 3) -> None:
+    report(benchmark(commands=commands, runs=runs))
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
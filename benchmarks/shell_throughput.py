@@ -0,0 +1,60 @@
+from typing import Dict
+
+import fire
+
+import dony
+from timing import best_of_async, report
+
+
+def benchmark(megabytes: int = 200, runs: int = 3) -> Dict[str, float]:
+    """Throughput of `dony.shell` on a command with large output.
+
+    Args:
+        megabytes: Output size of the command.
+        runs: Runs per case, the best one is reported.
+    """
+
+    command = f"yes dony | head -c {megabytes * 1024 * 1024}"
+
+    async def discard():
+        await dony.shell(command, quiet=True, capture_output=False, show_command=False)
+
+    async def capture():
+        await dony.shell(command, quiet=True, capture_output=True, show_command=False)
+
+    async def capture_result():
+        # Raw bytes only, nothing is decoded
+        await dony.shell(command, quiet=True, result=True, show_command=False)
+
+    async def capture_tail():
+        await dony.shell(
+            command,
+            quiet=True,
+            capture_output=dony.TailCapture(),
+            show_command=False,
+        )
+
+    async def session():
+        async with dony.Session() as session:
+            await session.shell(
+                command, quiet=True, capture_output=False, show_command=False
+            )
+
+    return {
+        f"{name}_mb_s": megabytes / best_of_async(case, runs=runs)
+        for name, case in [
+            ("discard", discard),
+            ("capture", capture),
+            ("capture_result", capture_result),
+            ("capture_tail", capture_tail),
+            ("session_discard", session),
+        ]
+    }
+
+
+def main(megabytes: int = 200, runs: int = 3) -> None:
+    report(benchmark(megabytes=megabytes, runs=runs))
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,29 @@
+import asyncio
+import time
+from typing import Any, Callable, Coroutine, Dict, Union
+
+
+def best_of(func: Callable[[], object], runs: int = 5) -> float:
+    """Best wall time of `runs` calls in seconds. The minimum is the least noisy estimate."""
+
+    times = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started_at)
+    return min(times)
+
+
+def best_of_async(
+    func: Callable[[], Coroutine[Any, Any, object]], runs: int = 5
+) -> float:
+    """Same as `best_of` for a coroutine function, each run in a fresh event loop."""
+    return best_of(lambda: asyncio.run(func()), runs=runs)
+
+
+def report(results: Dict[str, Union[int, float]]) -> None:
+    """Print results, one per line. Names end with the unit: `_ms`, `_mb`, `_mb_s`, ..."""
+
+    width = max(len(name) for name in results)
+    for name, value in results.items():
+        print(f"{name.ljust(width)}  {value:10.2f}")
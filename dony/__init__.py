@@ -1,26 +1,114 @@
-from importlib.metadata import version
-
-try:
-    __version__ = version("dony")
-except Exception:
-    __version__ = "unknown"
-
-from .shell import shell
-from .find_repo_root import find_repo_root
-from .prompts.confirm import confirm
-from .prompts.input import input
-from .prompts.press_any_key import press_any_key
-from .prompts.select import Choice, select
-from .prompts.select_many import select_many
-from .prompts.echo import echo
-from .prompts.error import error
-from .prompts.success import success
+from typing import TYPE_CHECKING
+
+# Shell-side modules are light and imported eagerly (their names also clash with submodules,
+# which rules out lazy loading). Prompts pull in questionary/prompt_toolkit, so they are
+# loaded on first access through the module-level __getattr__ below.
+
+from .shell import shell, ShellError, ShellTimeoutError
+from .shell_policy import configure_shell
+from .shell_result import ShellResult
+from .shell_many import shell_many
+from .shell_stream import ShellStream, shell_stream
+from .session import Session
+from .executor import Executor, LocalExecutor, use_executor
+from .env import Env, env
+from .watcher import Watcher
+from .recording import ReplayError, record, replay
+from .answers import AnswerError, answers
+from .ssh_executor import SSHExecutor
+from .execution_log import (
+    ExecutionRecord,
+    configure_execution_log,
+    execution_records,
+    execution_summary,
+)
+from .capture import Capture, TailCapture, HeadTailCapture, FileCapture
+from .find_repo_root import find_repo_root, find_repo_roots
 from .command import command
+from .run import run
+from .output import output_section
+
+if TYPE_CHECKING:
+    from .prompts.confirm import confirm
+    from .prompts.input import input
+    from .prompts.press_any_key import press_any_key
+    from .prompts.select import Choice, select
+    from .prompts.select_many import select_many
+    from .prompts.echo import echo
+    from .prompts.error import error
+    from .prompts.success import success
+
+    __version__: str
+
+_LAZY_ATTRIBUTES = {
+    "confirm": "dony.prompts.confirm",
+    "input": "dony.prompts.input",
+    "press_any_key": "dony.prompts.press_any_key",
+    "Choice": "dony.prompts.select",
+    "select": "dony.prompts.select",
+    "select_many": "dony.prompts.select_many",
+    "echo": "dony.prompts.echo",
+    "error": "dony.prompts.error",
+    "success": "dony.prompts.success",
+}
+
+
+def __getattr__(name: str):
+    if name == "__version__":
+        from importlib.metadata import version
+
+        try:
+            value = version("dony")
+        except Exception:
+            value = "unknown"
+    elif name in _LAZY_ATTRIBUTES:
+        from importlib import import_module
+
+        value = getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), "__version__", *_LAZY_ATTRIBUTES])
+
 
 __all__ = [
     "__version__",
     "shell",
+    "ShellError",
+    "ShellTimeoutError",
+    "configure_shell",
+    "ShellResult",
+    "shell_many",
+    "shell_stream",
+    "ShellStream",
+    "Session",
+    "Executor",
+    "LocalExecutor",
+    "SSHExecutor",
+    "use_executor",
+    "Env",
+    "env",
+    "Watcher",
+    "record",
+    "replay",
+    "ReplayError",
+    "answers",
+    "AnswerError",
+    "ExecutionRecord",
+    "configure_execution_log",
+    "execution_records",
+    "execution_summary",
+    "Capture",
+    "TailCapture",
+    "HeadTailCapture",
+    "FileCapture",
     "find_repo_root",
+    "find_repo_roots",
     "confirm",
     "input",
     "press_any_key",
@@ -31,4 +119,6 @@ __all__ = [
     "error",
     "success",
     "command",
+    "run",
+    "output_section",
 ]
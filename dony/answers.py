@@ -0,0 +1,149 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Generator, Mapping, Optional, Union
+
+
+class AnswerError(LookupError):
+    """Raised when prompts are answered with defaults and a prompt has neither an answer nor a default."""
+
+
+class _Missing:
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+# Returned by `provided_answer` when the user has to be asked
+MISSING: Any = _Missing()
+
+
+class Answers:
+    """Answers for prompts, by prompt message, used instead of asking the user."""
+
+    def __init__(
+        self,
+        answers: Optional[Mapping[str, Any]] = None,
+        use_defaults: Optional[bool] = None,
+    ):
+        self.answers: Dict[str, Any] = dict(answers or {})
+        self.use_defaults = use_defaults
+
+    @classmethod
+    def load(
+        cls, source: Union[str, Path, Mapping[str, Any]], **kwargs: Any
+    ) -> "Answers":
+        """Answers from a mapping, a JSON file or an inline JSON object."""
+
+        if isinstance(source, Mapping):
+            return cls(source, **kwargs)
+
+        import json
+
+        if isinstance(source, str) and source.lstrip().startswith("{"):
+            return cls(json.loads(source), **kwargs)
+        with open(source) as f:
+            return cls(json.load(f), **kwargs)
+
+
+def _env_flag(name: str) -> Optional[bool]:
+    value = os.environ.get(name)
+    if not value:
+        return None
+    return value.lower() not in ("0", "false", "no")
+
+
+_answers = Answers.load(
+    os.environ["DONY_ANSWERS"] if os.environ.get("DONY_ANSWERS") else {},
+    use_defaults=_env_flag("DONY_USE_DEFAULTS"),
+)
+
+
+@contextmanager
+def answers(
+    source: Union[str, Path, Mapping[str, Any], None] = None,
+    use_defaults: Optional[bool] = None,
+) -> Generator[Answers, None, None]:
+    """
+    Answer prompts in this block without asking the user (and without starting prompt_toolkit or fzf).
+    Can also be set up with the `DONY_ANSWERS` (a JSON file or an inline JSON object) and
+    `DONY_USE_DEFAULTS` environment variables.
+
+    Args:
+        source: Answers by prompt message: a mapping, a JSON file or an inline JSON object.
+                `confirm` takes a bool (or "yes"/"no"), `select` a value or a display value of
+                a choice, `select_many` a list of them, `input` a string.
+        use_defaults: Answer other prompts with their defaults instead of asking
+                      (off unless set here or with `DONY_USE_DEFAULTS=1`).
+    """
+
+    global _answers
+
+    previous = _answers
+    _answers = Answers.load(
+        {**previous.answers, **Answers.load(source or {}).answers},
+        use_defaults=previous.use_defaults if use_defaults is None else use_defaults,
+    )
+    try:
+        yield _answers
+    finally:
+        _answers = previous
+
+
+def uses_defaults() -> bool:
+    """Whether prompts without a provided answer are answered with their defaults."""
+    return bool(_answers.use_defaults)
+
+
+def provided_answer(prompt: str, message: str, default: Any = MISSING) -> Any:
+    """
+    The answer to a prompt, if it doesn't have to be asked: a provided answer, or the default
+    when defaults are used. Else `MISSING`.
+
+    Raises:
+        AnswerError: When defaults are used and the prompt has no default.
+    """
+
+    if message in _answers.answers:
+        return _answers.answers[message]
+
+    if not uses_defaults():
+        return MISSING
+
+    if default is MISSING:
+        raise AnswerError(
+            f"No answer for {prompt} {message!r} and defaults are used instead of asking: "
+            f"add it to DONY_ANSWERS or dony.answers()"
+        )
+    return default
+
+
+def as_bool(answer: Any) -> bool:
+    """An answer to a yes/no prompt, also from strings of a JSON file or an environment variable."""
+
+    if isinstance(answer, str):
+        if answer.strip().lower() in ("y", "yes", "true", "1"):
+            return True
+        if answer.strip().lower() in ("n", "no", "false", "0"):
+            return False
+        raise ValueError(f"Expected yes or no, got {answer!r}")
+    return bool(answer)
+
+
+def test():
+    with answers({"Deploy?": "no"}, use_defaults=True):
+        assert as_bool(provided_answer("confirm", "Deploy?", True)) is False
+        assert provided_answer("input", "Name?", "dony") == "dony"
+        try:
+            provided_answer("select", "Where?")
+            raise Exception("Should have failed")
+        except AnswerError:
+            pass
+
+        with answers(use_defaults=False):
+            # Outer answers are kept
+            assert provided_answer("confirm", "Deploy?") == "no"
+            assert provided_answer("input", "Name?", "dony") is MISSING
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,28 @@
+import os
+from pathlib import Path
+
+
+def get_cache_dir() -> Path:
+    """Get the user cache directory for dony.
+
+    Uses `DONY_CACHE_DIR` if set, then `$XDG_CACHE_HOME/dony`, then `~/.cache/dony`.
+    The directory is not created.
+    """
+
+    if os.environ.get("DONY_CACHE_DIR"):
+        return Path(os.environ["DONY_CACHE_DIR"])
+
+    if os.environ.get("XDG_CACHE_HOME"):
+        return Path(os.environ["XDG_CACHE_HOME"]) / "dony"
+
+    return Path.home() / ".cache" / "dony"
+
+
+def test():
+    os.environ["DONY_CACHE_DIR"] = "/tmp/dony-cache"
+    assert get_cache_dir() == Path("/tmp/dony-cache")
+    del os.environ["DONY_CACHE_DIR"]
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,253 @@
+import mmap
+import os
+from collections import deque
+from pathlib import Path
+from typing import IO, Deque, List, Optional, Union
+
+
+def _trim_start(data: bytes) -> bytes:
+    # When the data was cut at an arbitrary byte, skip UTF-8 continuation bytes at the start
+    start = 0
+    while start < min(len(data), 3) and data[start] & 0xC0 == 0x80:
+        start += 1
+    return data[start:]
+
+
+def _decode(data: bytes, errors: str, trim_start: bool = False) -> str:
+    if trim_start:
+        data = _trim_start(data)
+    return data.decode("utf-8", errors=errors)
+
+
+class Capture:
+    """
+    Storage for captured command output. Pass an instance as `capture_output` to `dony.shell`.
+
+    Subclasses implement `write` and `text`.
+    """
+
+    def write(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Called once the command has finished."""
+
+    def reset(self) -> None:
+        """Forget the output captured so far. Called before a command is retried."""
+
+    def text(self, errors: str = "replace") -> str:
+        """The captured output as returned by `dony.shell`."""
+        raise NotImplementedError
+
+    def data(self) -> bytes:
+        """The captured output as raw bytes, as kept in a `dony.ShellResult`."""
+        return self.text("surrogateescape").encode("utf-8", errors="surrogateescape")
+
+
+class MemoryCapture(Capture):
+    """Keeps all output in memory. Used by `capture_output=True`."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> None:
+        self._chunks.append(data)
+
+    def reset(self) -> None:
+        self._chunks = []
+
+    def text(self, errors: str = "replace") -> str:
+        return _decode(self.data(), errors)
+
+    def data(self) -> bytes:
+        # Join once, so that the chunks aren't kept twice
+        if len(self._chunks) > 1:
+            self._chunks = [b"".join(self._chunks)]
+        return self._chunks[0] if self._chunks else b""
+
+
+class TailCapture(Capture):
+    """Keeps only the last `max_bytes` of output, in constant memory."""
+
+    def __init__(self, max_bytes: int = 64 * 1024):
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self._chunks: Deque[bytes] = deque()
+        self._size = 0
+
+    def write(self, data: bytes) -> None:
+        self.n_bytes += len(data)
+        self._chunks.append(data)
+        self._size += len(data)
+
+        # - Drop whole chunks that are entirely out of the window
+
+        while (
+            len(self._chunks) > 1
+            and self._size - len(self._chunks[0]) >= self.max_bytes
+        ):
+            self._size -= len(self._chunks.popleft())
+
+    def reset(self) -> None:
+        self.n_bytes = 0
+        self._chunks.clear()
+        self._size = 0
+
+    def tail(self) -> bytes:
+        """The last `max_bytes` of output."""
+        data = b"".join(self._chunks)
+        return data[-self.max_bytes :] if self.max_bytes else b""
+
+    def text(self, errors: str = "replace") -> str:
+        return _decode(self.data(), errors)
+
+    def data(self) -> bytes:
+        data = self.tail()
+        return _trim_start(data) if self.n_bytes > self.max_bytes else data
+
+
+class HeadTailCapture(Capture):
+    """Keeps the first `head_bytes` and the last `tail_bytes` of output, in constant memory."""
+
+    def __init__(self, head_bytes: int = 16 * 1024, tail_bytes: int = 64 * 1024):
+        self.head_bytes = head_bytes
+        self._head = bytearray()
+        self._tail = TailCapture(tail_bytes)
+
+    @property
+    def n_bytes(self) -> int:
+        return len(self._head) + self._tail.n_bytes
+
+    def write(self, data: bytes) -> None:
+        free = self.head_bytes - len(self._head)
+        if free > 0:
+            self._head += data[:free]
+            data = data[free:]
+        if data:
+            self._tail.write(data)
+
+    def reset(self) -> None:
+        self._head = bytearray()
+        self._tail.reset()
+
+    def text(self, errors: str = "replace") -> str:
+        omitted = self._tail.n_bytes - self._tail.max_bytes
+        if omitted <= 0:
+            return _decode(bytes(self._head) + self._tail.tail(), errors)
+
+        return (
+            _decode(bytes(self._head), errors)
+            + f"\n... [{omitted} bytes omitted] ...\n"
+            + self._tail.text(errors)
+        )
+
+
+class FileCapture(Capture):
+    """
+    Spills output to a file instead of keeping it in memory.
+
+    `dony.shell` returns an empty string for this capture: read the output through
+    `path`, `open()`, `mmap()`, `read_text()` or `tail()`.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        """
+        Args:
+            path: Where to write the output. Defaults to a new temporary file,
+                  which is kept until `delete()` is called.
+        """
+        if path is None:
+            import tempfile
+
+            fd, path = tempfile.mkstemp(prefix="dony-", suffix=".log")
+            os.close(fd)
+        self.path = Path(path)
+        self.n_bytes = 0
+        self._file: Optional[IO[bytes]] = None
+
+    def write(self, data: bytes) -> None:
+        if self._file is None:
+            self._file = open(self.path, "wb")
+        self._file.write(data)
+        self.n_bytes += len(data)
+
+    def close(self) -> None:
+        if self._file is None:
+            self.path.write_bytes(b"")
+        else:
+            self._file.close()
+            self._file = None
+
+    def reset(self) -> None:
+        # The next write truncates the file
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.n_bytes = 0
+
+    def text(self, errors: str = "replace") -> str:
+        return ""
+
+    def data(self) -> bytes:
+        return b""
+
+    def open(self) -> IO[bytes]:
+        """Open the captured output for reading."""
+        return open(self.path, "rb")
+
+    def mmap(self) -> Union[mmap.mmap, bytes]:
+        """Memory-map the captured output (empty bytes if there is no output)."""
+        if self.path.stat().st_size == 0:
+            return b""
+        with self.open() as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_text(self, errors: str = "replace") -> str:
+        """Read the whole captured output into memory."""
+        return _decode(self.path.read_bytes(), errors)
+
+    def tail(self, n_bytes: int = 64 * 1024, errors: str = "replace") -> str:
+        """Read the last `n_bytes` of the captured output."""
+        with self.open() as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - n_bytes))
+            return _decode(f.read(), errors, trim_start=size > n_bytes)
+
+    def delete(self) -> None:
+        """Remove the file."""
+        self.path.unlink()
+
+
+def test():
+    # - Tail
+
+    capture = TailCapture(max_bytes=5)
+    for chunk in [b"hello ", b"wor", b"ld"]:
+        capture.write(chunk)
+    assert capture.text() == "world"
+    capture.reset()
+    capture.write(b"!")
+    assert capture.text() == "!"
+
+    # - Head and tail
+
+    capture = HeadTailCapture(head_bytes=3, tail_bytes=3)
+    capture.write(b"abcdefghij")
+    assert capture.text() == "abc\n... [4 bytes omitted] ...\nhij"
+    assert capture.data() == b"abc\n... [4 bytes omitted] ...\nhij"
+
+    # - File
+
+    capture = FileCapture()
+    capture.write(b"first attempt")
+    capture.reset()
+    capture.write("привет".encode())
+    capture.close()
+    assert capture.read_text() == "привет"
+    assert capture.tail(3) == "т"
+    assert bytes(capture.mmap()) == "привет".encode()
+    capture.delete()
+
+
+if __name__ == "__main__":
+    test()
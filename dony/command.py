@@ -1,12 +1,212 @@
-from typing import Callable, TypeVar
+import asyncio
+import functools
+import glob
+import hashlib
+import inspect
+import os
+import pickle
+from pathlib import Path
+from types import CodeType
+from typing import Any, Callable, Optional, Sequence, TypeVar, Union, cast
+
+from dony.cache_dir import get_cache_dir
+from dony.env import getenv
 
 F = TypeVar("F", bound=Callable)
 
+MAX_CACHE_BYTES = 100 * 1024 * 1024
+
+
+def command(
+    *,
+    depends_on: Sequence[Callable] = (),
+    inputs: Sequence[Union[str, Path]] = (),
+    envs: Sequence[str] = (),
+    fingerprint: str = "hash",
+    cache: bool = False,
+    max_cache_bytes: int = MAX_CACHE_BYTES,
+) -> Callable[[F], F]:
+    """
+    Decorator for commands. Without arguments it is a no-op marker.
+
+    Commands can declare other commands they depend on. `dony.run(target)` runs the
+    dependencies first, each once, running independent ones concurrently.
+
+    If inputs, envs or cache=True are given, the command is cached: its body is skipped and the
+    previous result is returned when the arguments, the input files and the env vars are the same
+    as on the last successful run. Results are stored under the user cache dir (see `DONY_CACHE_DIR`).
+    Set `DONY_NO_CACHE=1` to always run.
 
-def command() -> Callable[[F], F]:
-    """Marker decorator for commands. Currently a no-op."""
+    Args:
+        depends_on: Commands (called without arguments) to run before this one with `dony.run`.
+        inputs: Files, directories or glob patterns (`**` supported) the command depends on.
+                Relative paths are resolved from the current working directory.
+        envs: Names of environment variables the command depends on.
+        fingerprint: How to detect changed files: "hash" (content hash) or "mtime" (mtime and size).
+        cache: Caches by arguments even without inputs or envs.
+        max_cache_bytes: Evicts the oldest cached results when the cache grows larger than this.
+    """
+
+    if fingerprint not in ("hash", "mtime"):
+        raise ValueError('fingerprint must be "hash" or "mtime"')
 
     def decorator(func: F) -> F:
-        return func
+        if depends_on:
+            setattr(func, "__dony_depends_on__", tuple(depends_on))
+
+        if not (inputs or envs or cache):
+            return func
+
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError("Only async commands can be cached")
+
+        # Results of an older version of the command are not reused
+        code_hash = _code_hash(getattr(func, "__code__"))
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            # - Run directly if caching is disabled
+
+            if os.environ.get("DONY_NO_CACHE", "") not in ("", "0", "false"):
+                return await func(*args, **kwargs)
+
+            # - Return cached result if nothing changed
+
+            key = _hash(
+                func.__module__,
+                getattr(func, "__qualname__", repr(func)),
+                code_hash,
+                repr(args),
+                repr(sorted(kwargs.items())),
+            )
+            current_fingerprint = _fingerprint(inputs, envs, fingerprint)
+            path = get_cache_dir() / "commands" / key
+
+            cached = _read_cache(path)
+            if cached is not None and cached[0] == current_fingerprint:
+                return cached[1]
+
+            # - Run and store result
+
+            result = await func(*args, **kwargs)
+            _write_cache(path, (current_fingerprint, result), max_cache_bytes)
+            return result
+
+        return cast(F, wrapper)
 
     return decorator
+
+
+def _hash(*parts: Union[str, bytes]) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode() if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _code_hash(code: CodeType) -> str:
+    # Bytecode and constants, including those of nested functions. Code objects are hashed
+    # instead of using their repr, which contains a memory address
+    return _hash(
+        code.co_code,
+        *(
+            _code_hash(const) if isinstance(const, CodeType) else repr(const)
+            for const in code.co_consts
+        ),
+    )
+
+
+def _iter_files(inputs: Sequence[Union[str, Path]]):
+    for pattern in inputs:
+        paths = sorted(glob.glob(str(pattern), recursive=True)) or [str(pattern)]
+        for path in paths:
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs.sort()
+                    for name in sorted(files):
+                        yield os.path.join(root, name)
+            else:
+                yield path
+
+
+def _fingerprint(
+    inputs: Sequence[Union[str, Path]],
+    envs: Sequence[str],
+    fingerprint: str,
+) -> str:
+    parts = []
+
+    for path in _iter_files(inputs):
+        parts.append(path)
+        try:
+            if fingerprint == "mtime":
+                stat = os.stat(path)
+                parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+            else:
+                digest = hashlib.sha256()
+                with open(path, "rb") as f:
+                    for chunk in iter(functools.partial(f.read, 1024 * 1024), b""):
+                        digest.update(chunk)
+                parts.append(digest.hexdigest())
+        except OSError:
+            parts.append("missing")
+
+    for name in envs:
+        parts.append(f"{name}={getenv(name)!r}")
+
+    return _hash(*parts)
+
+
+def _read_cache(path: Path) -> Optional[Any]:
+    try:
+        with open(path, "rb") as f:
+            cached = pickle.load(f)
+        os.utime(path)  # mark as recently used
+        return cached
+    except Exception:
+        return None
+
+
+def _write_cache(path: Path, value: Any, max_cache_bytes: int) -> None:
+    try:
+        data = pickle.dumps(value)
+    except Exception:
+        return  # result can't be cached
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        # - Evict least recently used results
+
+        entries = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+            for entry in os.scandir(path.parent)
+        )
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total <= max_cache_bytes:
+                break
+            os.unlink(entry_path)
+            total -= size
+    except OSError:
+        pass
+
+
+async def example():
+    @command(inputs=["dony/*.py"], envs=["USER"])
+    async def count_lines():
+        print("Counting lines...")
+        return sum(
+            len(Path(path).read_text().splitlines()) for path in glob.glob("dony/*.py")
+        )
+
+    print(await count_lines())
+    print(await count_lines())  # cached, does not print "Counting lines..."
+
+
+if __name__ == "__main__":
+    asyncio.run(example())
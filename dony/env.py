@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+
+MAX_CACHED_ENVS = 64
+
+
+class Env(Mapping[str, str]):
+    """
+    Environment variable overrides for `dony.shell`, with the merged environment cached.
+
+    Use it as a context manager to apply the overrides to all commands in a block (tasks started
+    inside inherit them), or pass it as `envs=`:
+
+        prod = dony.Env(AWS_PROFILE="prod", AWS_REGION="eu-west-1")
+
+        with prod:
+            await dony.shell("aws s3 ls")
+
+        await dony.shell("terraform plan", envs=prod)
+
+    The merge with `os.environ` is done once and redone only when `os.environ` changes.
+    """
+
+    def __init__(self, overrides: Optional[Mapping[str, str]] = None, **kwargs: str):
+        self._overrides: Dict[str, str] = {**(overrides or {}), **kwargs}
+        self._environ: Optional[Dict[str, str]] = None
+        self._environ_data: Optional[dict] = None
+
+    def __getitem__(self, key: str) -> str:
+        return self._overrides[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._overrides)
+
+    def __len__(self) -> int:
+        return len(self._overrides)
+
+    def __repr__(self) -> str:
+        return f"Env({self._overrides!r})"
+
+    def environ(self) -> Optional[Dict[str, str]]:
+        """
+        The full environment for a new process, or None if nothing is overridden
+        (the process then inherits `os.environ` without a copy).
+        """
+
+        if not self._overrides:
+            return None
+
+        # Comparing the raw dict behind os.environ is much cheaper than merging it again
+        data = getattr(os.environ, "_data", None)
+        if self._environ is None or data is None or data != self._environ_data:
+            self._environ = {**os.environ, **self._overrides}
+            self._environ_data = dict(data) if data is not None else None
+        return self._environ
+
+    def __enter__(self) -> "Env":
+        # Tokens live in the context, not on the instance: tasks may enter the same Env concurrently
+        token = _scoped.set(_scoped.get().extend(self))
+        _tokens.set(_tokens.get() + (token,))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        *tokens, token = _tokens.get()
+        _tokens.set(tuple(tokens))
+        _scoped.reset(token)
+
+    def extend(self, overrides: Optional[Mapping[str, str]]) -> "Env":
+        """An `Env` with more overrides on top of these. Reuses cached instances."""
+
+        if not overrides:
+            return self
+        if not self._overrides and isinstance(overrides, Env):
+            return overrides
+        return _cached_env({**self._overrides, **overrides})
+
+
+# Overrides of the current block, see `env`
+_scoped: ContextVar[Env] = ContextVar("dony_env", default=Env())
+
+# Tokens to restore `_scoped` on leaving the `with` blocks of the current context, innermost last
+_tokens: ContextVar[Tuple[Token, ...]] = ContextVar("dony_env_tokens", default=())
+
+# Envs built for per-call overrides, so that repeated `envs=` mappings reuse their merged environment
+_cache: "OrderedDict[Tuple[Tuple[str, str], ...], Env]" = OrderedDict()
+
+
+def _cached_env(overrides: Dict[str, str]) -> Env:
+    key = tuple(sorted(overrides.items()))
+    env = _cache.get(key)
+    if env is None:
+        env = _cache[key] = Env(overrides)
+        if len(_cache) > MAX_CACHED_ENVS:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(key)
+    return env
+
+
+def env(overrides: Optional[Mapping[str, str]] = None, **kwargs: str) -> Env:
+    """
+    Override environment variables for all `dony.shell` calls in a block:
+
+        with dony.env(AWS_PROFILE="prod"):
+            await dony.shell("aws s3 ls")
+
+    Blocks nest, and `envs=` of a single call overrides them.
+
+    Args:
+        overrides: Variables to set, as a mapping.
+        **kwargs: Variables to set, as keyword arguments.
+    """
+    return Env(overrides, **kwargs)
+
+
+def current_env(envs: Optional[Mapping[str, str]] = None) -> Env:
+    """Overrides of the current block, extended with per-call `envs`."""
+    return _scoped.get().extend(envs)
+
+
+def getenv(name: str) -> Optional[str]:
+    """Value of an environment variable as commands see it: block overrides, then `os.environ`."""
+    return _scoped.get().get(name, os.environ.get(name))
+
+
+def build_env(envs: Optional[Mapping[str, str]]) -> Optional[Dict[str, str]]:
+    """
+    Environment for a new process with these overrides (block overrides are not added,
+    see `current_env`): None when nothing is overridden, else a cached merge with `os.environ`.
+    """
+
+    if not envs:
+        return None
+    return (envs if isinstance(envs, Env) else _cached_env(dict(envs))).environ()
+
+
+def test():
+    assert build_env(current_env()) is None
+
+    with env(A="1"):
+        assert getenv("A") == "1"
+        with env(B="2"):
+            environ = build_env(current_env({"C": "3"}))
+            assert environ is not None
+            assert environ["A"] + environ["B"] + environ["C"] == "123"
+            assert build_env(current_env({"C": "3"})) is environ  # cached
+
+        # os.environ changes are seen
+        os.environ["DONY_ENV_TEST"] = "x"
+        environ = build_env(current_env())
+        assert environ is not None and environ["DONY_ENV_TEST"] == "x"
+        del os.environ["DONY_ENV_TEST"]
+
+    assert getenv("A") is None
+
+    # - The same Env entered by concurrent tasks
+
+    import asyncio
+
+    shared = Env(A="1")
+
+    async def use() -> None:
+        with shared:
+            await asyncio.sleep(0.01)
+            assert getenv("A") == "1"
+
+    async def main() -> None:
+        await asyncio.gather(use(), use())
+
+    asyncio.run(main())
+    assert getenv("A") is None
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,162 @@
+import os
+import resource
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Deque, List, Optional, Union
+
+MAX_RECORDS = 10_000
+
+
+@dataclass
+class ExecutionRecord:
+    """Timing and resource usage of one `dony.shell` call."""
+
+    command: str
+    started_at: float  # unix timestamp
+    duration: float  # seconds from start to exit
+    time_to_first_byte: Optional[float]  # seconds from start to the first output byte
+    return_code: int
+    output_bytes: int
+    # Resource usage of finished child processes during the call. Taken from RUSAGE_CHILDREN,
+    # so it also counts other children that finished meanwhile when commands run concurrently,
+    # and reads zero for commands of a `Session` or `SSHExecutor`, whose shell outlives them.
+    child_user_time: float
+    child_system_time: float
+    cwd: Optional[str] = None
+    attempt: int = 1  # 1 for the first run, 2 for the first retry, ...
+    timed_out: bool = False
+
+
+class ExecutionTimer:
+    """Measures a command from start to exit. Used by `dony.shell`."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    def record(
+        self,
+        *,
+        command: str,
+        return_code: int,
+        output_bytes: int,
+        first_byte_at: Optional[float],
+        cwd: Optional[str] = None,
+        attempt: int = 1,
+        timed_out: bool = False,
+    ) -> ExecutionRecord:
+        """Build the record. `first_byte_at` is a `time.monotonic()` timestamp."""
+
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return ExecutionRecord(
+            command=command,
+            started_at=self.started_at,
+            duration=time.monotonic() - self._started,
+            time_to_first_byte=first_byte_at - self._started if first_byte_at else None,
+            return_code=return_code,
+            output_bytes=output_bytes,
+            child_user_time=usage.ru_utime - self._usage.ru_utime,
+            child_system_time=usage.ru_stime - self._usage.ru_stime,
+            cwd=cwd,
+            attempt=attempt,
+            timed_out=timed_out,
+        )
+
+
+_records: Deque[ExecutionRecord] = deque(maxlen=MAX_RECORDS)
+_hooks: List[Callable[[ExecutionRecord], None]] = []
+_trace_file: Optional[Path] = (
+    Path(os.environ["DONY_TRACE_FILE"]) if os.environ.get("DONY_TRACE_FILE") else None
+)
+
+
+def configure_execution_log(
+    *,
+    trace_file: Optional[Union[str, Path]] = None,
+    hook: Optional[Callable[[ExecutionRecord], None]] = None,
+) -> None:
+    """
+    Configure where execution records of `dony.shell` calls go.
+
+    Records are always kept in memory for `execution_summary`.
+
+    Args:
+        trace_file: Appends each record as a JSON line to this file.
+                    Can also be set with the `DONY_TRACE_FILE` environment variable.
+        hook: Called with each record after the command exits.
+    """
+
+    global _trace_file
+
+    if trace_file is not None:
+        _trace_file = Path(trace_file)
+    if hook is not None:
+        _hooks.append(hook)
+
+
+def log_execution(record: ExecutionRecord) -> None:
+    """Store a record and pass it to the trace file and hooks."""
+
+    _records.append(record)
+
+    if _trace_file is not None:
+        import json
+
+        with open(_trace_file, "a") as f:
+            f.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+
+    for hook in _hooks:
+        hook(record)
+
+
+def execution_records() -> List[ExecutionRecord]:
+    """Records of the `dony.shell` calls made so far in this process."""
+    return list(_records)
+
+
+def execution_summary(limit: int = 10) -> str:
+    """A table of the slowest commands run so far in this process."""
+
+    records = sorted(_records, key=lambda record: record.duration, reverse=True)[:limit]
+    rows = [
+        (
+            f"{record.duration:.2f}s",
+            f"{record.time_to_first_byte:.2f}s"
+            if record.time_to_first_byte is not None
+            else "-",
+            f"{record.child_user_time + record.child_system_time:.2f}s",
+            str(record.return_code),
+            str(record.output_bytes),
+            " ".join(record.command.split())[:60],
+        )
+        for record in records
+    ]
+    header = ("wall", "first byte", "cpu", "exit", "bytes", "command")
+    widths = [
+        max(len(row[i]) for row in [header, *rows]) for i in range(len(header) - 1)
+    ]
+
+    return "\n".join(
+        "  ".join([*(cell.rjust(width) for cell, width in zip(row, widths)), row[-1]])
+        for row in [header, *rows]
+    )
+
+
+def test():
+    log_execution(
+        ExecutionTimer().record(
+            command="sleep 1",
+            return_code=0,
+            output_bytes=0,
+            first_byte_at=None,
+        )
+    )
+    assert execution_records()[-1].command == "sleep 1"
+    print(execution_summary())
+
+
+if __name__ == "__main__":
+    test()
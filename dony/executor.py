@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Generator, Mapping, Optional, Union
+
+from dony.env import build_env
+from dony.output_reader import OutputReader, read_stream
+from dony.process import terminate_process
+
+
+class Executor:
+    """
+    Where `dony.shell` runs its commands.
+
+    Subclasses implement `run`. Executors that hold resources (processes, connections) start
+    them on first use and release them in `close`, so they can be used with `async with`.
+    """
+
+    # Whether `run` can keep stderr apart from stdout (`dony.shell(..., separate_stderr=True)`)
+    supports_separate_stderr = False
+
+    async def run(
+        self,
+        command: str,
+        reader: OutputReader,
+        *,
+        stderr_reader: Optional[OutputReader] = None,
+        run_from: Optional[Union[str, Path]] = None,
+        envs: Optional[Mapping[str, str]] = None,
+        new_session: bool = False,
+    ) -> int:
+        """
+        Run a prepared command line, feeding its output to the reader.
+
+        Cancelling the call stops the command.
+
+        Args:
+            command: The command line, with the `set` prefix already applied.
+            reader: Receives stdout, and stderr too unless `stderr_reader` is given.
+            stderr_reader: Receives stderr. Only passed if `supports_separate_stderr` is True.
+            run_from: Working directory for this command.
+            envs: Environment variable overrides for this command, including the ones
+                  of `dony.env` blocks.
+            new_session: Run the command in its own session, so that it is stopped together
+                         with its children. Set by `dony.shell` when watchers or a timeout
+                         may stop the command.
+
+        Returns:
+            The exit code.
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Release the resources of the executor."""
+
+    async def __aenter__(self) -> "Executor":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def shell(self, command: str, **kwargs):
+        """Execute a command with this executor. Accepts the same arguments as `dony.shell`."""
+
+        from dony.shell import shell  # avoid circular import
+
+        return await shell(command, executor=self, **kwargs)
+
+
+def _stdin_is_terminal() -> bool:
+    try:
+        return sys.stdin is not None and sys.stdin.isatty()
+    except ValueError:  # closed
+        return False
+
+
+class LocalExecutor(Executor):
+    """
+    Runs each command in a new local shell process. The default executor.
+
+    Unless stdin is a terminal, each command runs in its own session, so that cancelling
+    `dony.shell` (a timeout, a failing sibling in `asyncio.gather`) stops the command together
+    with the processes it started. From a terminal, commands keep it, so that they can ask for
+    a password; Ctrl-C reaches them through the terminal, and commands run with watchers or
+    a timeout still get their own session.
+    """
+
+    supports_separate_stderr = True
+
+    def __init__(self, *, new_session: Optional[bool] = None):
+        """
+        Args:
+            new_session: Starts every command in its own session (True) or only the ones run with
+                         watchers or a timeout (False). By default, True unless stdin is a terminal.
+        """
+        self.new_session = new_session
+
+    async def run(
+        self,
+        command: str,
+        reader: OutputReader,
+        *,
+        stderr_reader: Optional[OutputReader] = None,
+        run_from: Optional[Union[str, Path]] = None,
+        envs: Optional[Mapping[str, str]] = None,
+        new_session: bool = False,
+    ) -> int:
+        # - Execute with optional working directory
+
+        if self.new_session is None:
+            new_session = new_session or not _stdin_is_terminal()
+        else:
+            new_session = new_session or self.new_session
+        proc = await asyncio.create_subprocess_shell(
+            command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+            if stderr_reader is not None
+            else asyncio.subprocess.STDOUT,
+            cwd=str(run_from) if run_from is not None else None,
+            env=build_env(envs),
+            start_new_session=new_session,
+        )
+
+        # - Read output, draining both pipes concurrently so that neither blocks the child
+
+        if proc.stdout is None:
+            raise RuntimeError("Process stdout is unexpectedly None")
+        try:
+            if stderr_reader is not None and proc.stderr is not None:
+                await asyncio.gather(
+                    read_stream(proc.stdout, reader),
+                    read_stream(proc.stderr, stderr_reader),
+                )
+            else:
+                await read_stream(proc.stdout, reader)
+
+            return await proc.wait()
+        except asyncio.CancelledError:
+            await terminate_process(proc, group=new_session)
+            raise
+
+
+_executor: ContextVar[Executor] = ContextVar("dony_executor", default=LocalExecutor())
+
+
+def get_executor() -> Executor:
+    """The executor `dony.shell` uses when none is passed (see `use_executor`)."""
+    return _executor.get()
+
+
+@contextmanager
+def use_executor(executor: Executor) -> Generator[Executor, None, None]:
+    """
+    Run `dony.shell` calls in this block with the executor, unless they pass their own.
+
+    The executor is kept in a context variable, so tasks started inside the block use it too.
+    That way the same commands can run against many hosts concurrently:
+
+        async def deploy(host):
+            async with dony.SSHExecutor(host) as executor:
+                with dony.use_executor(executor):
+                    await dony.shell("systemctl restart app")
+
+        await asyncio.gather(*(deploy(host) for host in hosts))
+
+    Args:
+        executor: Executor for this block.
+    """
+
+    token = _executor.set(executor)
+    try:
+        yield executor
+    finally:
+        _executor.reset(token)
+
+
+async def example():
+    reader = OutputReader(quiet=True)
+    assert await LocalExecutor().run("echo $X", reader, envs={"X": "local"}) == 0
+    assert reader.close() == "local\n"
+
+    with use_executor(LocalExecutor()) as executor:
+        assert get_executor() is executor
+
+
+if __name__ == "__main__":
+    asyncio.run(example())
@@ -1,29 +1,118 @@
+import os
 from pathlib import Path
-from typing import Union
+from typing import Dict, Iterable, List, Optional, Union
+
+# Resolved directory -> repo root (or None if there is none above it)
+_cache: Dict[str, Optional[str]] = {}
+
+# Absolute input path -> resolved path, so that symlinks are only resolved once per path
+_resolved: Dict[str, str] = {}
+
+
+def _is_repo_root(directory: str) -> bool:
+    # `.git` is a directory in regular repos and a file with `gitdir: <path>` in worktrees and submodules
+    git_path = os.path.join(directory, ".git")
+    if os.path.isdir(git_path):
+        return True
+    try:
+        with open(git_path, "rb") as f:
+            return f.read(8) == b"gitdir: "
+    except OSError:
+        return False
+
+
+def _resolve(path: Union[str, Path]) -> str:
+    absolute = os.path.abspath(path)
+    if absolute not in _resolved:
+        _resolved[absolute] = os.path.realpath(absolute)
+    return _resolved[absolute]
+
+
+def _lookup(start: str) -> Optional[str]:
+    # - Walk upward until a cached directory or a repo root is found
+
+    visited: List[str] = []
+    current = start
+    while True:
+        if current in _cache:
+            root = _cache[current]
+            break
+        visited.append(current)
+        if _is_repo_root(current):
+            root = current
+            break
+        parent = os.path.dirname(current)
+        if parent == current:
+            root = None
+            break
+        current = parent
+
+    # - Remember the result for every visited directory
+
+    for directory in visited:
+        _cache[directory] = root
+
+    return root
 
 
 def find_repo_root(path: Union[str, Path]) -> Path:
     """Find the git root directory.
 
+    Handles `.git` files of worktrees and submodules, whose root is the worktree or submodule
+    directory. Results are cached for every directory visited on the way up, and symlinks are
+    resolved once per path, so later lookups from the same tree are O(1). Call `find_repo_root.cache_clear()` after creating or
+    removing repositories.
+
     Args:
         path: Where to start searching.
 
     Raises:
         FileNotFoundError: If no git root directory is found.
     """
-    current_dir = Path(path).resolve()
-    while not (current_dir / ".git").exists():
-        if current_dir.parent == current_dir:
-            raise FileNotFoundError(
-                f"Git root not found - no .git directory found starting from {path}"
-            )
-        current_dir = current_dir.parent
+    root = _lookup(_resolve(path))
+    if root is None:
+        raise FileNotFoundError(
+            f"Git root not found - no .git directory found starting from {path}"
+        )
+
+    return Path(root)
+
+
+def find_repo_roots(
+    paths: Iterable[Union[str, Path]],
+) -> Dict[Union[str, Path], Optional[Path]]:
+    """Find the git root directories of many paths at once.
+
+    Paths sharing ancestors are resolved with a single walk up the tree.
+
+    Args:
+        paths: Where to start searching.
+
+    Returns:
+        A mapping from each path to its git root, or None if it is not inside a repository.
+    """
+    roots: Dict[Union[str, Path], Optional[Path]] = {}
+    for path in paths:
+        root = _lookup(_resolve(path))
+        roots[path] = Path(root) if root is not None else None
+    return roots
+
+
+def cache_clear() -> None:
+    """Forget the cached repo roots."""
+    _cache.clear()
+    _resolved.clear()
+
 
-    return current_dir
+setattr(find_repo_root, "cache_clear", cache_clear)
 
 
 def test():
     assert find_repo_root(Path.cwd()).name == "dony"
+    assert find_repo_roots([__file__, "/"]) == {
+        __file__: find_repo_root(__file__),
+        "/": None,
+    }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from dony.cache_dir import get_cache_dir
+
+MEMORY_CACHE_SIZE = 1024
+DISK_CACHE_SIZE = 4096
+
+_memory_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+@lru_cache(maxsize=None)
+def shfmt_path() -> Optional[str]:
+    """Path to the shfmt executable, or None if it is not installed. Detected once per process."""
+    return shutil.which("shfmt")
+
+
+def _disk_cache_enabled() -> bool:
+    return os.environ.get("DONY_SHFMT_DISK_CACHE", "") not in ("", "0", "false")
+
+
+def _disk_cache_path(command: str) -> Path:
+    return (
+        get_cache_dir()
+        / "shfmt"
+        / hashlib.sha256(command.encode("utf-8", "surrogatepass")).hexdigest()
+    )
+
+
+def _read_disk_cache(command: str) -> Optional[str]:
+    path = _disk_cache_path(command)
+    try:
+        formatted_command = path.read_text(encoding="utf-8")
+        os.utime(path)  # mark as recently used
+        return formatted_command
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def _write_disk_cache(command: str, formatted_command: str) -> None:
+    path = _disk_cache_path(command)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(formatted_command, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+        # - Evict least recently used entries
+
+        entries = list(os.scandir(path.parent))
+        if len(entries) > DISK_CACHE_SIZE:
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[: len(entries) - DISK_CACHE_SIZE]:
+                os.unlink(entry.path)
+    except OSError:
+        pass
+
+
+async def _run_shfmt(command: str) -> Optional[str]:
+    executable = shfmt_path()
+    if executable is None:
+        return None
+
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            executable,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await proc.communicate(input=command.encode())
+    except OSError:
+        return None
+
+    if proc.returncode != 0:
+        return None
+
+    return stdout.decode(errors="replace").strip() or None
+
+
+async def format_command(command: str) -> str:
+    """
+    Format a command with shfmt for display. Falls back to the original command
+    if shfmt is not installed or fails to parse it.
+
+    Results are cached in memory, and on disk under the user cache dir
+    when `DONY_SHFMT_DISK_CACHE=1` is set.
+    """
+
+    # - Look up in-process cache
+
+    if command in _memory_cache:
+        _memory_cache.move_to_end(command)
+        return _memory_cache[command]
+
+    # - Look up disk cache, then run shfmt
+
+    formatted_command = None
+    if _disk_cache_enabled():
+        formatted_command = _read_disk_cache(command)
+
+    if formatted_command is None:
+        formatted_command = await _run_shfmt(command)
+        if formatted_command is None:
+            formatted_command = command
+        elif _disk_cache_enabled():
+            _write_disk_cache(command, formatted_command)
+
+    # - Store in in-process cache
+
+    _memory_cache[command] = formatted_command
+    if len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+
+    return formatted_command
+
+
+async def example():
+    print(await format_command("if true;then echo 'formatted';fi"))
+
+
+if __name__ == "__main__":
+    asyncio.run(example())
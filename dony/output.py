@@ -0,0 +1,175 @@
+import asyncio
+import sys
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import (
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+# Label of the output section of the current task (inherited by tasks it creates)
+_section: ContextVar[Optional[str]] = ContextVar("dony_output_section", default=None)
+
+
+class OutputManager:
+    """
+    Serializes terminal output of concurrently running commands and prompts.
+
+    - Output written inside `output_section(label)` is prefixed with the label line by line,
+      so lines of concurrent commands never tear
+    - While a prompt is active, other output is held back and written once it is answered
+    - Only one prompt is active at a time
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._paused = 0
+        self._pending: List[Callable[[], None]] = []
+        self._partial_lines: Dict[Tuple[str, Optional[TextIO]], str] = {}
+        self._prompt_lock: Optional[asyncio.Lock] = None
+        self._prompt_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def paused(self) -> bool:
+        """Whether a prompt is active and output is held back."""
+        return self._paused > 0
+
+    def run(self, action: Callable[[], None]) -> None:
+        """Run an output action now, or after the active prompt."""
+
+        with self._lock:
+            if self._paused:
+                self._pending.append(action)
+            else:
+                action()
+
+    def write(self, text: str, stream: Optional[TextIO] = None) -> None:
+        """
+        Write text to the stream (sys.stdout by default).
+
+        In a section only complete lines are written, prefixed with the label. The rest is
+        kept until the line is complete or the section ends.
+        """
+
+        if not text:
+            return
+
+        label = _section.get()
+        if label is not None:
+            with self._lock:
+                key = (label, stream)
+                *lines, self._partial_lines[key] = (
+                    self._partial_lines.get(key, "") + text
+                ).split("\n")
+            if not lines:
+                return
+            text = "".join(f"[{label}] {line}\n" for line in lines)
+
+        self.write_now(text, stream)
+
+    def write_now(self, text: str, stream: Optional[TextIO] = None) -> None:
+        """Write text as is, or after the active prompt."""
+        self.run(lambda: _write(stream or sys.stdout, text))
+
+    def flush_section(self, label: str) -> None:
+        """Write the incomplete last lines of a section."""
+
+        with self._lock:
+            keys = [key for key in self._partial_lines if key[0] == label]
+            partial_lines = [(key, self._partial_lines.pop(key)) for key in keys]
+
+        for (_, stream), line in partial_lines:
+            if line:
+                self.write_now(f"[{label}] {line}\n", stream)
+
+    def prefix(self, text: str) -> str:
+        """Prefix every line of the text with the label of the current section, if any."""
+
+        label = _section.get()
+        if label is None:
+            return text
+        return "\n".join(f"[{label}] {line}" for line in text.split("\n"))
+
+    @asynccontextmanager
+    async def prompt(self) -> AsyncGenerator[None, None]:
+        """Hold the terminal for an interactive prompt."""
+
+        # asyncio.Lock binds to the loop it is created in, so make one per loop
+        loop = asyncio.get_event_loop()
+        if self._prompt_lock is None or self._prompt_loop is not loop:
+            self._prompt_lock = asyncio.Lock()
+            self._prompt_loop = loop
+
+        async with self._prompt_lock:
+            with self._lock:
+                self._paused += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._paused -= 1
+                    pending, self._pending = self._pending, []
+                    for action in pending:
+                        action()
+
+
+def _write(stream: TextIO, text: str) -> None:
+    stream.write(text)
+    stream.flush()
+
+
+output_manager = OutputManager()
+
+
+@contextmanager
+def output_section(label: str) -> Generator[None, None, None]:
+    """
+    Prefix output of commands and messages in this block with `[label]`.
+
+    The label is kept in a context variable, so tasks started inside the block inherit it:
+
+        async def build(name):
+            with dony.output_section(name):
+                await dony.shell(f"make {name}")
+
+        await asyncio.gather(build("frontend"), build("backend"))
+
+    Args:
+        label: Shown in front of every line.
+    """
+
+    token = _section.set(label)
+    try:
+        yield
+    finally:
+        output_manager.flush_section(label)
+        _section.reset(token)
+
+
+async def example():
+    async def count(label: str):
+        with output_section(label):
+            for i in range(3):
+                output_manager.write(f"{i}")  # partial line, completed below
+                await asyncio.sleep(0.01)
+                output_manager.write("\n")
+
+    await asyncio.gather(count("a"), count("b"))
+
+    # - Output is held back while a prompt is active
+
+    async with output_manager.prompt():
+        output_manager.write("after the prompt\n")
+        assert output_manager.paused
+        print("prompt")
+
+
+if __name__ == "__main__":
+    asyncio.run(example())
@@ -0,0 +1,165 @@
+import asyncio
+import codecs
+import time
+from typing import Callable, List, Optional, Sequence, TextIO, Union
+
+from dony.capture import Capture, MemoryCapture
+from dony.output import output_manager
+from dony.watcher import Watcher
+
+CHUNK_SIZE = 64 * 1024
+MAX_WATCHED_LINE = 1024 * 1024  # longer lines are checked by their end
+
+
+class OutputReader:
+    """
+    Consumes command output in byte chunks: prints it as it arrives and captures the raw bytes.
+
+    Printing uses an incremental decoder, so multibyte characters split across chunks are
+    handled and lines of any length are fine. Captured bytes are decoded once in `close`.
+    """
+
+    def __init__(
+        self,
+        *,
+        quiet: bool = False,
+        capture_output: Union[bool, Capture] = True,
+        errors: str = "replace",
+        stream: Optional[TextIO] = None,
+        watchers: Sequence[Watcher] = (),
+        on_match: Optional[Callable[[Watcher], None]] = None,
+        record_output: bool = False,
+    ):
+        """
+        Args:
+            quiet: Suppresses printing.
+            capture_output: Keeps the output to return it from `close`. A `Capture` instance
+                            selects where and how much of it is kept.
+            errors: How to handle bytes that are not valid UTF-8 (as in `bytes.decode`).
+            stream: Where to print the output. Defaults to sys.stdout.
+            watchers: Check each line of the output.
+            on_match: Called with each watcher that matched.
+            record_output: Keeps all output for `recorded_output`, whatever the capture policy.
+        """
+        self.quiet = quiet
+        self.capture: Optional[Capture] = (
+            MemoryCapture() if capture_output is True else capture_output or None
+        )
+        self.errors = errors
+        self.stream = stream
+        self.n_bytes = 0
+        self.started_at = time.monotonic()
+        self.first_byte_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.watchers: List[Watcher] = list(watchers)
+        self.on_match = on_match
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors=errors)
+        self._partial_line = ""
+        self._recorded: Optional[List[bytes]] = [] if record_output else None
+
+    def feed(self, data: bytes) -> None:
+        """Process a chunk of output."""
+
+        if not data:
+            return
+
+        if self.first_byte_at is None:
+            self.first_byte_at = time.monotonic()
+        self.n_bytes += len(data)
+
+        if not self.quiet or self.watchers:
+            text = self._decoder.decode(data)
+            if not self.quiet:
+                self._write(text)
+            if self.watchers:
+                self._watch(text)
+        if self.capture is not None:
+            self.capture.write(data)
+        if self._recorded is not None:
+            self._recorded.append(data)
+
+    def close(self) -> str:
+        """Finish reading. Returns the captured output (empty if capture_output=False)."""
+
+        self.finish()
+        return self.text()
+
+    def finish(self) -> None:
+        """Finish reading: flush printing and watchers, and close the capture."""
+
+        if self.finished_at is not None:
+            return
+        self.finished_at = time.monotonic()
+
+        if not self.quiet or self.watchers:
+            text = self._decoder.decode(b"", final=True)
+            if not self.quiet:
+                self._write(text)
+            if self.watchers:
+                self._watch(text, final=True)
+
+        if self.capture is not None:
+            self.capture.close()
+
+    def text(self) -> str:
+        """The captured output, after `finish` (empty if capture_output=False)."""
+        return self.capture.text(self.errors) if self.capture is not None else ""
+
+    def data(self) -> bytes:
+        """The captured output as raw bytes, after `finish` (empty if capture_output=False)."""
+        return self.capture.data() if self.capture is not None else b""
+
+    def recorded_output(self) -> str:
+        """All output, if `record_output` was set."""
+        return b"".join(self._recorded or []).decode("utf-8", errors="replace")
+
+    def _watch(self, text: str, final: bool = False) -> None:
+        # Check complete lines only. The last line is checked once the output ends
+        *lines, self._partial_line = (self._partial_line + text).split("\n")
+        self._partial_line = self._partial_line[-MAX_WATCHED_LINE:]
+        if final and self._partial_line:
+            lines.append(self._partial_line)
+
+        for line in lines:
+            for watcher in self.watchers:
+                if watcher.feed(line) and self.on_match is not None:
+                    self.on_match(watcher)
+
+    def _write(self, text: str) -> None:
+        output_manager.write(text, self.stream)
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to close (or to now, if still reading)."""
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Output throughput."""
+        return self.n_bytes / self.duration if self.duration > 0 else 0.0
+
+
+async def read_stream(
+    stream: asyncio.StreamReader,
+    reader: OutputReader,
+    chunk_size: int = CHUNK_SIZE,
+) -> None:
+    """Feed everything from the stream into the reader until EOF."""
+
+    while True:
+        data = await stream.read(chunk_size)
+        if not data:
+            break
+        reader.feed(data)
+
+
+def test():
+    reader = OutputReader(quiet=True)
+    for chunk in [b"caf", b"\xc3", b"\xa9\n", b"bad \xff byte"]:
+        reader.feed(chunk)
+    assert reader.close() == "café\nbad � byte"
+    assert reader.n_bytes == 16
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import signal
+
+# How often `terminate_process` checks whether the children of a stopped process have exited
+GROUP_POLL_INTERVAL = 0.05
+
+
+def signal_process_group(proc: asyncio.subprocess.Process, sig: int) -> None:
+    """Send a signal to the process group of a process started with `start_new_session=True`."""
+
+    try:
+        os.killpg(proc.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def process_group_alive(proc: asyncio.subprocess.Process) -> bool:
+    """Whether any process is left in the process group of a process started with `start_new_session=True`."""
+
+    try:
+        os.killpg(proc.pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def reap_orphans(proc: asyncio.subprocess.Process) -> None:
+    """
+    Collect exited processes of the group that were reparented to this process, which happens
+    when it is a subreaper or PID 1 in a container. Call after `proc` has been waited for.
+    """
+
+    while True:
+        try:
+            pid, _ = os.waitpid(-proc.pid, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+
+async def terminate_process(
+    proc: asyncio.subprocess.Process,
+    grace_period: float = 3.0,
+    group: bool = True,
+) -> None:
+    """
+    Stop a process started with `start_new_session=True`, together with its children:
+    SIGTERM to the whole process group, then SIGKILL if anything in it is still running after
+    `grace_period` seconds. Children that outlive the process on SIGTERM are stopped the same way.
+
+    With `group=False`, for a process that shares the process group of this one, only the
+    process itself is stopped.
+    """
+
+    if proc.returncode is not None:
+        return
+
+    if not group:
+        proc.terminate()
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=grace_period)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+        # Children left running may still hold the pipes
+        transport = getattr(proc, "_transport", None)
+        if transport is not None:
+            transport.close()
+        return
+
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + grace_period
+
+    signal_process_group(proc, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(proc.wait(), timeout=grace_period)
+        reap_orphans(proc)
+        while process_group_alive(proc) and loop.time() < deadline:
+            await asyncio.sleep(GROUP_POLL_INTERVAL)
+            reap_orphans(proc)
+    except asyncio.TimeoutError:
+        pass
+
+    if process_group_alive(proc):
+        signal_process_group(proc, signal.SIGKILL)
+    await proc.wait()
+    reap_orphans(proc)
+
+
+async def example():
+    proc = await asyncio.create_subprocess_shell(
+        "sleep 100 & sleep 100",
+        start_new_session=True,
+    )
+    await terminate_process(proc)
+    print("Exit code:", proc.returncode)
+
+
+if __name__ == "__main__":
+    asyncio.run(example())
@@ -1,6 +1,10 @@
 import asyncio
 
+from dony.answers import MISSING, as_bool, provided_answer
+from dony.recording import recorded_prompt
 
+
+@recorded_prompt("confirm")
 async def confirm(
     message: str,
     default: bool = True,
@@ -11,6 +15,12 @@ async def confirm(
 
     # NOTE: typing is worse than using arrows, so we'll just use select instead of `questionary.confirm` with [Y/n]
 
+    # - Use the provided answer in automation
+
+    answer = provided_answer("confirm", message, default)
+    if answer is not MISSING:
+        return as_bool(answer)
+
     # - Run select prompt
 
     from dony.prompts.select import select  # avoid circular import
@@ -5,6 +5,8 @@ import questionary
 from prompt_toolkit import print_formatted_text
 from prompt_toolkit.formatted_text import FormattedText
 
+from dony.output import output_manager
+
 
 async def echo(
     message: str,
@@ -14,13 +16,16 @@ async def echo(
         ]
     ),
 ) -> None:
-    return print_formatted_text(
-        FormattedText(
-            [
-                ("class:question", dedent(message).strip()),
-            ]
-        ),
-        style=style,
+    text = output_manager.prefix(dedent(message).strip())
+    output_manager.run(
+        lambda: print_formatted_text(
+            FormattedText(
+                [
+                    ("class:question", text),
+                ]
+            ),
+            style=style,
+        )
     )
 
 
@@ -4,23 +4,28 @@ import questionary
 from prompt_toolkit import print_formatted_text
 from prompt_toolkit.formatted_text import FormattedText
 
+from dony.output import output_manager
+
 
 async def error(
     message: str,
     prefix: str = "✕ ",
 ) -> None:
-    return print_formatted_text(
-        FormattedText(
-            [
-                ("class:question", prefix + message),
-            ]
-        ),
-        style=questionary.Style(
-            [
-                ("question", "fg:ansired"),  # the question text
-                ("question", "bold"),  # the question text
-            ]
-        ),
+    text = output_manager.prefix(prefix + message)
+    output_manager.run(
+        lambda: print_formatted_text(
+            FormattedText(
+                [
+                    ("class:question", text),
+                ]
+            ),
+            style=questionary.Style(
+                [
+                    ("question", "fg:ansired"),  # the question text
+                    ("question", "bold"),  # the question text
+                ]
+            ),
+        )
     )
 
 
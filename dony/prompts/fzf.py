@@ -0,0 +1,90 @@
+import asyncio
+import os
+from typing import AsyncIterable, AsyncIterator, Iterable, List, TypeVar, Union
+
+from dony.output import output_manager
+
+T = TypeVar("T")
+
+Items = Union[Iterable[T], AsyncIterable[T]]
+
+
+async def iterate(items: Items[T]) -> AsyncIterator[T]:
+    """Iterate over a regular or an async iterable."""
+
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def collect(items: Items[T]) -> List[T]:
+    """Collect a regular or an async iterable into a list."""
+
+    if isinstance(items, AsyncIterable):
+        return [item async for item in items]
+    return list(items)
+
+
+async def run_fzf(args: List[str], lines: Items[str]) -> str:
+    """
+    Run fzf, streaming NUL-separated lines to its stdin as they are produced,
+    so that it becomes interactive before all of them are available.
+
+    Returns:
+        fzf's stdout (empty if nothing was selected).
+
+    Raises:
+        FileNotFoundError: If fzf is not installed.
+    """
+
+    # Other output waits until the selection is made
+    async with output_manager.prompt():
+        return await _run_fzf(args, lines)
+
+
+async def _run_fzf(args: List[str], lines: Items[str]) -> str:
+    proc = await asyncio.create_subprocess_exec(
+        "fzf",
+        "--read0",  # ← treat NUL as item separator
+        *args,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        # fzf runs preview commands with $SHELL: use plain sh rather than the user's login shell
+        env={**os.environ, "SHELL": "sh"},
+    )
+    assert proc.stdin is not None and proc.stdout is not None
+    stdin = proc.stdin
+
+    # - Feed lines in the background
+
+    async def feed() -> None:
+        try:
+            async for line in iterate(lines):
+                stdin.write(line.encode() + b"\0")
+                await stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # fzf exited before all lines were sent
+        finally:
+            stdin.close()
+            try:
+                await stdin.wait_closed()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    feeder = asyncio.ensure_future(feed())
+
+    # - Wait for the selection
+
+    try:
+        stdout = await proc.stdout.read()
+        await proc.wait()
+    finally:
+        if not feeder.done():
+            feeder.cancel()
+        await asyncio.gather(feeder, return_exceptions=True)
+
+    return stdout.decode()
@@ -1,31 +1,45 @@
 import asyncio
 
-import questionary
-from prompt_toolkit.styles import Style
+from dony.answers import MISSING, provided_answer
+from dony.output import output_manager
+from dony.recording import recorded_prompt
 
 
+@recorded_prompt("input")
 async def input(
     message: str,
     default: str = "",
     allow_empty: bool = False,
     multiline: bool = False,
 ) -> str:
+    # - Use the provided answer in automation
+
+    answer = provided_answer(
+        "input", message, default if default or allow_empty else MISSING
+    )
+    if answer is not MISSING:
+        return str(answer)
+
     # - Run input prompt
 
+    import questionary  # prompt_toolkit is slow to import, load it only to ask
+    from prompt_toolkit.styles import Style
+
     while True:
         # - Ask
 
-        result = await questionary.text(
-            message,
-            default=default,
-            qmark="•",
-            style=Style(
-                [
-                    ("question", "fg:ansiblue"),  # the question text
-                ]
-            ),
-            multiline=multiline,
-        ).ask_async()
+        async with output_manager.prompt():
+            result = await questionary.text(
+                message,
+                default=default,
+                qmark="•",
+                style=Style(
+                    [
+                        ("question", "fg:ansiblue"),  # the question text
+                    ]
+                ),
+                multiline=multiline,
+            ).ask_async()
 
         # - Raise KeyboardInterrupt if no result
 
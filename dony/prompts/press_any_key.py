@@ -1,22 +1,33 @@
 import asyncio
 
-import questionary
-from prompt_toolkit.styles import Style
+from dony.answers import MISSING, provided_answer
+from dony.output import output_manager
+from dony.recording import recorded_prompt
 
 
+@recorded_prompt("press_any_key")
 async def press_any_key(
     message: str = "Press any key to continue...",
 ) -> None:
+    # - Don't wait in automation
+
+    if provided_answer("press_any_key", message, None) is not MISSING:
+        return
+
     # - Press any key
 
-    result = await questionary.press_any_key_to_continue(
-        message=message,
-        style=Style(
-            [
-                ("question", "fg:ansiblue"),  # the question text
-            ]
-        ),
-    ).ask_async()
+    import questionary  # prompt_toolkit is slow to import, load it only to ask
+    from prompt_toolkit.styles import Style
+
+    async with output_manager.prompt():
+        result = await questionary.press_any_key_to_continue(
+            message=message,
+            style=Style(
+                [
+                    ("question", "fg:ansiblue"),  # the question text
+                ]
+            ),
+        ).ask_async()
 
     # - Raise KeyboardInterrupt if no result
 
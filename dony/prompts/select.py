@@ -1,15 +1,41 @@
 import asyncio
-from dataclasses import dataclass
-from typing import Sequence, Union, Optional, Dict, TypeVar, Generic
-
-import questionary
-from questionary import Choice as QuestionaryChoice
-from prompt_toolkit.styles import Style
+from dataclasses import dataclass, fields
+from typing import (
+    Any,
+    AsyncIterator,
+    Union,
+    Optional,
+    List,
+    Sequence,
+    Type,
+    TypeVar,
+    Generic,
+    cast,
+)
+
+from dony.answers import MISSING, provided_answer
+from dony.output import output_manager
+from dony.prompts.fzf import Items, collect, iterate, run_fzf
+from dony.recording import recorded_prompt
 
 
 T = TypeVar("T")
+C = TypeVar("C")
+
+
+def _with_slots(cls: Type[C]) -> Type[C]:
+    # Large choice lists create many instances, but `@dataclass(slots=True)` needs Python 3.10:
+    # recreate the class with a slot per field. Defaults stay in the generated __init__,
+    # so they are removed from the class namespace
+    namespace = dict(cls.__dict__)
+    names = tuple(field.name for field in fields(cast(Any, cls)))
+    for name in names + ("__dict__", "__weakref__"):
+        namespace.pop(name, None)
+    namespace["__slots__"] = names
+    return cast(Type[C], type(cls)(cls.__name__, cls.__bases__, namespace))
 
 
+@_with_slots
 @dataclass
 class Choice(Generic[T]):
     """A choice with optional descriptions for select prompts."""
@@ -25,9 +51,61 @@ class Choice(Generic[T]):
             self.display_value = str(self.value)
 
 
+def fzf_line(index: int, choice: Union[str, Choice], delimiter: str = "\t") -> str:
+    """
+    A line for fzf: a hidden index field, then the display value and both descriptions.
+
+    fzf prints the selected lines back, so the index maps them to their values in O(1),
+    even when several choices share a display value.
+    """
+
+    if isinstance(choice, Choice):
+        return delimiter.join(
+            [str(index), choice.display_value, choice.short_desc, choice.long_desc]
+        )
+    return f"{index}{delimiter}{choice}{delimiter}{delimiter}"
+
+
+def fzf_preview_args(choices: Items[Union[str, Choice]]) -> List[str]:
+    """
+    fzf arguments for previewing long descriptions.
+
+    The preview takes the description straight from the line with a field placeholder, so moving
+    the cursor runs a single `printf` builtin in `sh` instead of an `echo | cut` pipeline.
+    Lists without long descriptions get no preview at all.
+    """
+
+    if isinstance(choices, Sequence) and not any(
+        isinstance(choice, Choice) and choice.long_desc for choice in choices
+    ):
+        return []
+
+    return [
+        "--preview",
+        "printf '%s' {4..}",  # fields from 4 on, in case the description contains tabs
+        "--preview-window",
+        "down:30%:wrap",
+    ]
+
+
+def match_choice(
+    answer: Any, choices: Sequence[Union[str, Choice[T]]]
+) -> Union[T, str]:
+    """The value of the choice a provided answer refers to, by its value or its display value."""
+
+    for choice in choices:
+        value = choice.value if isinstance(choice, Choice) else choice
+        if answer == value or answer == str(value):
+            return value
+        if isinstance(choice, Choice) and answer == choice.display_value:
+            return value
+    raise ValueError(f"{answer!r} is not one of the choices")
+
+
+@recorded_prompt("select")
 async def select(
     message: str,
-    choices: Sequence[Union[str, Choice[T]]],
+    choices: Items[Union[str, Choice[T]]],
     default: Optional[str] = None,
     fuzzy: bool = True,
     allow_custom: bool = False,
@@ -44,16 +122,24 @@ async def select(
     If fuzzy is True, uses fzf with a preview pane for the long descriptions.
     Falls back to questionary if fzf is not available or fuzzy is False.
 
+    Choices can be a list, a generator or an async iterable. In fuzzy mode they are streamed
+    to fzf as they are produced, so the prompt is interactive before the listing is complete.
+
     Args:
         allow_custom: If True, adds a custom option that prompts for text entry.
         custom_choice_text: The text to display for the custom option (default: "Custom").
     """
 
-    # - Add custom choice if requested
+    # - Use the provided answer in automation
 
-    actual_choices = list(choices)
-    if allow_custom:
-        actual_choices.append(custom_choice_text)
+    answer = provided_answer("select", message, MISSING if default is None else default)
+    if answer is not MISSING:
+        try:
+            return match_choice(answer, await collect(choices))
+        except ValueError:
+            if allow_custom:
+                return str(answer)
+            raise
 
     # - Run fuzzy select prompt
 
@@ -62,66 +148,48 @@ async def select(
             # - Build command
 
             delimiter = "\t"
-            lines = []
-
-            # Map from the displayed first field back to the real value
-            display_map: Dict[str, Union[T, str]] = {}
-
-            for choice in actual_choices:
-                if isinstance(choice, Choice):
-                    value = choice.value
-                    display_value = choice.display_value
-                    short_desc = choice.short_desc
-                    long_desc = choice.long_desc
-                else:
-                    value = choice
-                    display_value = str(choice)
-                    short_desc = ""
-                    long_desc = ""
-
-                display_map[display_value] = value
-                lines.append(
-                    f"{display_value}{delimiter}{short_desc}{delimiter}{long_desc}"
-                )
+
+            # Values by index, as fzf echoes the index back with the selected line
+            values: List[Union[T, str]] = []
+
+            async def lines() -> AsyncIterator[str]:
+                # Lines are produced while fzf is already running
+                async for choice in iterate(choices):
+                    values.append(
+                        choice.value if isinstance(choice, Choice) else choice
+                    )
+                    yield fzf_line(len(values) - 1, choice, delimiter)
+
+                if allow_custom:
+                    values.append(custom_choice_text)
+                    yield fzf_line(len(values) - 1, custom_choice_text, delimiter)
 
             cmd = [
-                "fzf",
-                "--read0",  # ← treat NUL as item separator
                 "--prompt",
                 f"{message} 👆",
                 "--with-nth",
-                "1,2",
+                "2,3",
                 "--delimiter",
                 delimiter,
-                "--preview",
-                "echo {} | cut -f3",
-                "--preview-window",
-                "down:30%:wrap",
+                *fzf_preview_args(choices),
             ]
 
             # - Run command
 
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.DEVNULL,
-            )
-            stdout, _ = await proc.communicate(input="\0".join(lines).encode())
-            output = stdout.decode()
+            output = await run_fzf(cmd, lines())
 
             if output == "":
                 raise KeyboardInterrupt
 
             # - Parse output
 
-            # fzf returns lines like "disp1<sep>disp2", so split on the delimiter
-            picked_display = output.strip().split(delimiter, 1)[0]
-            result = display_map[picked_display]
+            # fzf returns the whole line "index<sep>display<sep>...", so take the first field
+            index = int(output.split(delimiter, 1)[0])
+            result = values[index]
 
             # - Handle custom input if selected
 
-            if allow_custom and result == custom_choice_text:
+            if allow_custom and index == len(values) - 1:
                 from dony.prompts.input import input as input_text
 
                 return await input_text(
@@ -138,8 +206,18 @@ async def select(
                 "fzf is not installed. Install it or set fuzzy=False to use the default prompt."
             )
 
+    # - Add custom choice if requested
+
+    actual_choices: List[Union[str, Choice[T]]] = await collect(choices)
+    if allow_custom:
+        actual_choices.append(custom_choice_text)
+
     # - Fallback to questionary
 
+    import questionary  # prompt_toolkit is slow to import, load it only to ask
+    from questionary import Choice as QuestionaryChoice
+    from prompt_toolkit.styles import Style
+
     q_choices = []
 
     for choice in actual_choices:
@@ -175,18 +253,19 @@ async def select(
 
     # - Run select prompt
 
-    result = await questionary.select(
-        message=message,
-        choices=q_choices,
-        default=default,
-        qmark="•",
-        instruction=" ",
-        style=Style(
-            [
-                ("question", "fg:ansiblue"),  # the question text
-            ]
-        ),
-    ).ask_async()
+    async with output_manager.prompt():
+        result = await questionary.select(
+            message=message,
+            choices=q_choices,
+            default=default,
+            qmark="•",
+            instruction=" ",
+            style=Style(
+                [
+                    ("question", "fg:ansiblue"),  # the question text
+                ]
+            ),
+        ).ask_async()
 
     # - Raise KeyboardInterrupt if no result
 
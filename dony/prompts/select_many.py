@@ -1,19 +1,20 @@
 import asyncio
-from typing import List, Sequence, Union, Optional, Dict, TypeVar
+from typing import AsyncIterator, List, Sequence, Union, Optional, TypeVar
 
-import questionary
-from questionary import Choice as QuestionaryChoice
-from prompt_toolkit.styles import Style
-
-from dony.prompts.select import Choice
+from dony.answers import MISSING, provided_answer
+from dony.output import output_manager
+from dony.prompts.fzf import Items, collect, iterate, run_fzf
+from dony.prompts.select import Choice, fzf_line, fzf_preview_args, match_choice
+from dony.recording import recorded_prompt
 
 
 T = TypeVar("T")
 
 
+@recorded_prompt("select_many")
 async def select_many(
     message: str,
-    choices: Sequence[Union[str, Choice[T]]],
+    choices: Items[Union[str, Choice[T]]],
     default: Optional[Sequence[str]] = None,
     fuzzy: bool = True,
     allow_empty_selection: bool = False,
@@ -27,113 +28,155 @@ async def select_many(
 
     If fuzzy is True, uses fzf with a preview pane for the long descriptions.
     Falls back to questionary if fzf is not available or fuzzy is False.
+
+    Choices can be a list, a generator or an async iterable. In fuzzy mode without defaults
+    they are streamed to fzf as they are produced.
     """
 
+    # - Use the provided answer in automation
+
+    answer = provided_answer(
+        "select_many",
+        message,
+        list(default or []) if default or allow_empty_selection else MISSING,
+    )
+    if answer is not MISSING:
+        answers = [answer] if isinstance(answer, str) else answer
+        if not answers and not allow_empty_selection:
+            raise ValueError(f"Empty answer for {message!r}")
+        actual_choices = await collect(choices)
+        return [match_choice(item, actual_choices) for item in answers]
+
     # - Run fuzzy select prompt
 
     if fuzzy:
-        while True:
-            try:
-                # - Build command
+        delimiter = "\t"
+        produced_lines: List[str] = []
+        default_positions: List[int] = []  # 1-indexed positions of default items
 
-                delimiter = "\t"
-                lines = []
-                default_positions = []  # 1-indexed positions of default items
+        # Values by index, as fzf echoes the index back with the selected lines
+        values: List[Union[T, str]] = []
 
-                # Map from the displayed first field back to the real value
-                display_map: Dict[str, Union[T, str]] = {}
+        # Build set of default values for pre-selection
+        default_set: set[str] = set(default or [])
 
-                # Build set of default values for pre-selection
-                default_set: set[str] = set(default or [])
+        # Single pass over the choices, shared by retries. It runs in its own task: when fzf
+        # exits while an async source is waiting for its next item, cancelling the fzf feeder
+        # must not close the source, or a retry would miss the remaining choices
+        produced = asyncio.Event()
 
-                for idx, choice in enumerate(choices):
+        async def produce() -> None:
+            try:
+                async for choice in iterate(choices):
                     if isinstance(choice, Choice):
                         value = choice.value
                         display_value = choice.display_value
-                        short_desc = choice.short_desc
-                        long_desc = choice.long_desc
                     else:
                         value = choice
                         display_value = str(choice)
-                        short_desc = ""
-                        long_desc = ""
 
-                    display_map[display_value] = value
-                    line = (
-                        f"{display_value}{delimiter}{short_desc}{delimiter}{long_desc}"
-                    )
-                    lines.append(line)
+                    values.append(value)
+                    produced_lines.append(fzf_line(len(values) - 1, choice, delimiter))
 
                     # Track positions of default items (1-indexed for fzf)
                     is_default = value in default_set or display_value in default_set
                     if is_default:
-                        default_positions.append(idx + 1)
-
-                cmd = [
-                    "fzf",
-                    "--read0",  # ← treat NUL as item separator
-                    "--sync",  # wait for input to complete before starting
-                    "--prompt",
-                    f"{message} 👆",
-                    "--with-nth",
-                    "1,2",
-                    "--delimiter",
-                    delimiter,
-                    "--preview",
-                    "echo {} | cut -f3",
-                    "--preview-window",
-                    "down:30%:wrap",
-                    "--multi",
-                ]
-
-                # Pre-select default items using pos() to jump to each position
-                if default_positions:
-                    # Build actions: pos(n)+select for each default position
-                    actions = "+".join(
-                        [f"pos({pos})+select" for pos in default_positions]
+                        default_positions.append(len(produced_lines))
+
+                    produced.set()
+            finally:
+                produced.set()
+
+        producer = asyncio.ensure_future(produce())
+
+        async def lines() -> AsyncIterator[str]:
+            # Lines produced so far, then the others as they are produced
+            index = 0
+            while True:
+                while index < len(produced_lines):
+                    yield produced_lines[index]
+                    index += 1
+                if producer.done():
+                    producer.result()  # raises an error of the source
+                    return
+                produced.clear()
+                await produced.wait()
+
+        try:
+            # Pre-selecting defaults needs all items loaded before fzf starts, so don't stream then
+            if default:
+                await producer
+
+            while True:
+                try:
+                    # - Build command
+
+                    cmd = [
+                        "--prompt",
+                        f"{message} 👆",
+                        "--with-nth",
+                        "2,3",
+                        "--delimiter",
+                        delimiter,
+                        *fzf_preview_args(choices),
+                        "--multi",
+                    ]
+
+                    # Pre-select default items using pos() to jump to each position
+                    if default_positions:
+                        # Build actions: pos(n)+select for each default position
+                        actions = "+".join(
+                            [f"pos({pos})+select" for pos in default_positions]
+                        )
+                        cmd.extend(
+                            [
+                                "--sync",  # wait for input to complete before starting
+                                "--bind",
+                                f"start:{actions}",
+                            ]
+                        )
+
+                    # - Run command
+
+                    output = await run_fzf(cmd, lines())
+
+                    if output == "":
+                        raise KeyboardInterrupt
+
+                    # - Parse output
+
+                    # fzf returns whole lines "index<sep>display<sep>...", so take the first fields
+                    results = [
+                        values[int(line.split(delimiter, 1)[0])]
+                        for line in output.strip().splitlines()
+                    ]
+
+                    # - Try again if no results
+
+                    if not results and not allow_empty_selection:
+                        # try again
+                        continue
+
+                    # - Return if all is good
+
+                    return results
+
+                except FileNotFoundError:
+                    raise FileNotFoundError(
+                        "fzf is not installed. Install it or set fuzzy=False to use the default prompt."
                     )
-                    cmd.extend(["--bind", f"start:{actions}"])
-
-                # - Run command
-
-                proc = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdin=asyncio.subprocess.PIPE,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.DEVNULL,
-                )
-                stdout, _ = await proc.communicate(input="\0".join(lines).encode())
-                output = stdout.decode()
-
-                if output == "":
-                    raise KeyboardInterrupt
-
-                # - Parse output
-
-                # fzf returns lines like "disp1<sep>disp2", so split on the delimiter
-                picked_displays = [
-                    line.split(delimiter, 1)[0] for line in output.strip().splitlines()
-                ]
-                results = [display_map[d] for d in picked_displays]
-
-                # - Try again if no results
-
-                if not results and not allow_empty_selection:
-                    # try again
-                    continue
-
-                # - Return if all is good
-
-                return results
-
-            except FileNotFoundError:
-                raise FileNotFoundError(
-                    "fzf is not installed. Install it or set fuzzy=False to use the default prompt."
-                )
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
 
     # - Fallback to questionary
 
+    import questionary  # prompt_toolkit is slow to import, load it only to ask
+    from questionary import Choice as QuestionaryChoice
+    from prompt_toolkit.styles import Style
+
     q_choices = []
+    choices = await collect(choices)
 
     for choice in choices:
         if isinstance(choice, Choice):
@@ -171,17 +214,18 @@ async def select_many(
     while True:
         # - Ask
 
-        result = await questionary.checkbox(
-            message=message,
-            choices=q_choices,
-            qmark="•",
-            instruction="",
-            style=Style(
-                [
-                    ("question", "fg:ansiblue"),  # the question text
-                ]
-            ),
-        ).ask_async()
+        async with output_manager.prompt():
+            result = await questionary.checkbox(
+                message=message,
+                choices=q_choices,
+                qmark="•",
+                instruction="",
+                style=Style(
+                    [
+                        ("question", "fg:ansiblue"),  # the question text
+                    ]
+                ),
+            ).ask_async()
 
         # - Raise if KeyboardInterrupt
 
@@ -4,24 +4,29 @@ import questionary
 from prompt_toolkit import print_formatted_text
 from prompt_toolkit.formatted_text import FormattedText
 
+from dony.output import output_manager
+
 
 async def success(
     message: str,
     prefix: str = "✓ ",
 ) -> None:
-    return print_formatted_text(
-        FormattedText(
-            [
-                ("class:qmark", ""),
-                ("class:question", prefix + message),
-            ]
-        ),
-        style=questionary.Style(
-            [
-                ("question", "fg:ansigreen"),  # the question text
-                ("question", "bold"),  # the question text
-            ]
-        ),
+    text = output_manager.prefix(prefix + message)
+    output_manager.run(
+        lambda: print_formatted_text(
+            FormattedText(
+                [
+                    ("class:qmark", ""),
+                    ("class:question", text),
+                ]
+            ),
+            style=questionary.Style(
+                [
+                    ("question", "fg:ansigreen"),  # the question text
+                    ("question", "bold"),  # the question text
+                ]
+            ),
+        )
     )
 
 
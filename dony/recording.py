@@ -0,0 +1,253 @@
+import functools
+import inspect
+import os
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    Optional,
+    Tuple,
+    Union,
+)
+
+Key = Tuple[str, ...]
+
+
+class ReplayError(LookupError):
+    """Raised in replay mode when the trace has no result for a command or a prompt."""
+
+
+class Recorder:
+    """Appends shell results and prompt answers to a trace file, one JSON object per line."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._file: IO[str] = open(self.path, "w")
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        import json
+
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()  # keep the trace of a script that crashes
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Replayer:
+    """
+    Serves results from a trace file. Only JSON is read from it, so replaying a trace
+    never runs code from it. Entries with the same command (or prompt) are served
+    in recorded order, so concurrent commands replay correctly as well.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        import json
+
+        self.path = Path(path)
+        self._entries: Dict[Key, Deque[Dict[str, Any]]] = defaultdict(deque)
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[_key(entry)].append(entry)
+
+    def take(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """The next recorded entry matching the given command or prompt."""
+
+        entries = self._entries.get(_key(entry))
+        if not entries:
+            what = entry.get("command") or f"{entry['prompt']} {entry['message']!r}"
+            raise ReplayError(f"No recorded result in {self.path} for {what}")
+        return entries.popleft()
+
+
+def _key(entry: Dict[str, Any]) -> Key:
+    if entry["type"] == "shell":
+        return ("shell", entry["command"], entry.get("cwd") or "")
+    return ("prompt", entry["prompt"], entry.get("message") or "")
+
+
+_recorder: Optional[Recorder] = (
+    Recorder(os.environ["DONY_RECORD"]) if os.environ.get("DONY_RECORD") else None
+)
+_replayer: Optional[Replayer] = (
+    Replayer(os.environ["DONY_REPLAY"]) if os.environ.get("DONY_REPLAY") else None
+)
+
+
+def recorder() -> Optional[Recorder]:
+    """The active recorder, if any."""
+    return _recorder
+
+
+def replayer() -> Optional[Replayer]:
+    """The active replayer, if any."""
+    return _replayer
+
+
+@contextmanager
+def record(path: Union[str, Path]) -> Generator[Recorder, None, None]:
+    """
+    Record results of `dony.shell` calls and prompt answers in this block to a trace file,
+    to replay them later with `dony.replay`. Can also be enabled with the `DONY_RECORD`
+    environment variable.
+
+    Args:
+        path: The trace file (JSON lines). Overwritten if it exists.
+    """
+
+    global _recorder
+
+    previous, _recorder = _recorder, Recorder(path)
+    try:
+        yield _recorder
+    finally:
+        _recorder.close()
+        _recorder = previous
+
+
+@contextmanager
+def replay(path: Union[str, Path]) -> Generator[Replayer, None, None]:
+    """
+    Serve results of `dony.shell` calls and prompt answers in this block from a trace file made
+    by `dony.record`, without running anything. Commands are matched by their text and working
+    directory, prompts by their message. Can also be enabled with the `DONY_REPLAY`
+    environment variable.
+
+    Args:
+        path: The trace file.
+
+    Raises:
+        ReplayError: When a command or prompt is not in the trace.
+    """
+
+    global _replayer
+
+    previous, _replayer = _replayer, Replayer(path)
+    try:
+        yield _replayer
+    finally:
+        _replayer = previous
+
+
+def _encode(value: Any) -> Any:
+    # JSON as is. Other values (e.g. values of `dony.Choice`) are stored as text and matched
+    # against the choices of the prompt on replay, so that a trace never has to be unpickled
+    import json
+
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        if isinstance(value, list):
+            return [_encode(item) for item in value]
+        return {"$choice": str(value)}
+
+
+async def _decode(value: Any, choices: Any) -> Any:
+    if isinstance(value, list):
+        return [await _decode(item, choices) for item in value]
+    if not (isinstance(value, dict) and set(value) == {"$choice"}):
+        return value
+    if choices is None:
+        raise ReplayError(
+            f"Recorded choice {value['$choice']!r} for a prompt without choices"
+        )
+
+    from dony.prompts.fzf import collect
+    from dony.prompts.select import match_choice
+
+    try:
+        return match_choice(value["$choice"], await collect(choices))
+    except ValueError:
+        raise ReplayError(
+            f"Recorded choice {value['$choice']!r} is not one of the choices"
+        ) from None
+
+
+# Set while a recorded prompt runs, so that prompts it uses internally aren't recorded too
+_in_prompt: ContextVar[bool] = ContextVar("dony_in_prompt", default=False)
+
+
+def recorded_prompt(name: str) -> Callable[[Callable], Callable]:
+    """Record the answers of a prompt function, or serve them in replay mode."""
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if (_recorder is None and _replayer is None) or _in_prompt.get():
+                return await func(*args, **kwargs)
+
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            entry = {
+                "type": "prompt",
+                "prompt": name,
+                "message": arguments.arguments.get("message", ""),
+            }
+
+            if _replayer is not None:
+                return await _decode(
+                    _replayer.take(entry)["answer"], arguments.arguments.get("choices")
+                )
+
+            token = _in_prompt.set(True)
+            try:
+                answer = await func(*args, **kwargs)
+            finally:
+                _in_prompt.reset(token)
+            if _recorder is not None:
+                _recorder.write({**entry, "answer": _encode(answer)})
+            return answer
+
+        return wrapper
+
+    return decorator
+
+
+def test():
+    import asyncio
+    import tempfile
+
+    from dony.prompts.select import Choice
+
+    @recorded_prompt("ask")
+    async def ask(message: str) -> Any:
+        return {"answer": message.upper()}
+
+    @recorded_prompt("pick")
+    async def pick(message: str, choices: Any) -> Any:
+        return [choices[1].value]
+
+    choices = [Choice(Path("/a")), Choice(Path("/b"))]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "trace.jsonl"
+
+        with record(path):
+            assert asyncio.run(ask("yes")) == {"answer": "YES"}
+            assert asyncio.run(pick("Where?", choices)) == [Path("/b")]
+        assert "pickle" not in path.read_text()
+
+        with replay(path):
+            assert asyncio.run(ask("yes")) == {"answer": "YES"}
+            assert asyncio.run(pick("Where?", choices)) == [Path("/b")]
+            try:
+                asyncio.run(ask("yes"))
+                raise Exception("Should have failed")
+            except ReplayError:
+                pass
+
+
+if __name__ == "__main__":
+    test()
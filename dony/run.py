@@ -0,0 +1,178 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from dony.command import command
+from dony.shell import _new_session
+
+
+def get_dependencies(func: Callable) -> Sequence[Callable]:
+    """Commands declared with `@dony.command(depends_on=[...])`."""
+    return getattr(func, "__dony_depends_on__", ())
+
+
+def _name(func: Callable) -> str:
+    # Callables such as functools.partial objects have no __name__
+    return getattr(func, "__name__", repr(func))
+
+
+def _check_cycles(target: Callable) -> None:
+    visiting: List[Callable] = []
+    visited = set()
+
+    def visit(func: Callable) -> None:
+        if func in visited:
+            return
+        if func in visiting:
+            cycle = visiting[visiting.index(func) :] + [func]
+            raise ValueError(
+                "Dependency cycle: " + " -> ".join(_name(f) for f in cycle)
+            )
+        visiting.append(func)
+        for dependency in get_dependencies(func):
+            visit(dependency)
+        visiting.pop()
+        visited.add(func)
+
+    visit(target)
+
+
+def _has_concurrent_branches(target: Callable) -> bool:
+    # Commands only run concurrently when one of them depends on several others
+    seen = set()
+    pending = [target]
+    while pending:
+        func = pending.pop()
+        if func in seen:
+            continue
+        seen.add(func)
+        dependencies = get_dependencies(func)
+        if len(dependencies) > 1:
+            return True
+        pending.extend(dependencies)
+    return False
+
+
+async def run(
+    target: Callable,
+    *,
+    workers: int = 4,
+    show_critical_path: bool = True,
+) -> Any:
+    """
+    Run a command after its dependencies (see `@dony.command(depends_on=[...])`).
+
+    Every command in the graph runs once per call, independent branches run concurrently,
+    and the first failure cancels everything still running. Shell commands of concurrent
+    branches run in their own session, so that cancelling them also stops the processes
+    they started (see `new_session` of `dony.shell`).
+
+    Args:
+        target: The command to run. It and its dependencies are called without arguments.
+        workers: Maximum number of commands running at the same time.
+        show_critical_path: Prints the chain of commands that determined the total time.
+
+    Returns:
+        The result of the target command.
+
+    Raises:
+        ValueError: If the dependencies form a cycle.
+    """
+
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    _check_cycles(target)
+
+    semaphore = asyncio.Semaphore(workers)
+    tasks: Dict[Callable, "asyncio.Future[Any]"] = {}
+    timings: Dict[Callable, Tuple[float, float]] = {}
+
+    # - Run a command once its dependencies are done
+
+    async def _run(func: Callable) -> Any:
+        await asyncio.gather(
+            *(_schedule(dependency) for dependency in get_dependencies(func))
+        )
+        async with semaphore:
+            started_at = time.monotonic()
+            result = await func()
+            timings[func] = (started_at, time.monotonic())
+        return result
+
+    def _schedule(func: Callable) -> "asyncio.Future[Any]":
+        if func not in tasks:
+            tasks[func] = asyncio.ensure_future(_run(func))
+        return tasks[func]
+
+    # - Run the graph, cancelling everything on the first failure. Concurrent commands run
+    #   shell commands in their own session, so that cancelling them stops their processes too
+
+    token = _new_session.set(workers > 1 and _has_concurrent_branches(target))
+    started_at = time.monotonic()
+    try:
+        result = await _schedule(target)
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    finally:
+        _new_session.reset(token)
+
+    # - Print critical path: from the target, follow the dependency that finished last
+
+    if show_critical_path:
+        # Before the import below, which the first call pays for
+        total = time.monotonic() - started_at
+
+        from dony.prompts.echo import echo as dony_print
+
+        path: List[Callable] = []
+        func: Optional[Callable] = target
+        while func is not None:
+            path.append(func)
+            dependencies = get_dependencies(func)
+            func = (
+                max(dependencies, key=lambda dependency: timings[dependency][1])
+                if dependencies
+                else None
+            )
+
+        await dony_print(
+            "Critical path: "
+            + " → ".join(
+                f"{_name(f)} ({timings[f][1] - timings[f][0]:.1f}s)"
+                for f in reversed(path)
+            )
+            + f", total {total:.1f}s",
+        )
+
+    return result
+
+
+async def example():
+    @command()
+    async def install():
+        await asyncio.sleep(0.2)
+
+    @command(depends_on=[install])
+    async def build_frontend():
+        await asyncio.sleep(0.3)
+
+    @command(depends_on=[install])
+    async def build_backend():
+        await asyncio.sleep(0.1)
+
+    @command(depends_on=[build_frontend, build_backend])
+    async def deploy():
+        await asyncio.sleep(0.1)
+        return "deployed"
+
+    # install runs once, both builds run concurrently: ~0.6s instead of ~0.9s
+
+    assert await run(deploy) == "deployed"
+
+
+if __name__ == "__main__":
+    asyncio.run(example())
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import shlex
+import signal
+from pathlib import Path
+from typing import Mapping, Optional, Sequence, Union
+
+from dony.env import build_env
+from dony.executor import Executor
+from dony.output_reader import CHUNK_SIZE, OutputReader
+from dony.process import reap_orphans, signal_process_group
+
+# Runs once when the session starts. Each command runs in a subshell, so `set -e` or `exit`
+# can't kill the session; the subshell saves its cwd and exported variables on exit,
+# and the session shell restores them afterwards (sourced at top level, since `declare`
+# inside a function would make the variables local).
+_SETUP = r"""
+__dony_dir=$(mktemp -d)
+__dony_save() {
+    pwd > "$__dony_dir/cwd"
+    export -p > "$__dony_dir/env"
+}
+__dony_restore_cwd() {
+    if IFS= read -r __dony_cwd < "$__dony_dir/cwd"; then
+        cd "$__dony_cwd"
+    fi
+}
+"""
+
+
+class Session(Executor):
+    """
+    A long-lived bash process that runs commands one after another (an `Executor`).
+
+    Avoids spawning a new shell for every command. Changes of the working directory and
+    exported environment variables made by a command carry over to the next ones.
+
+    Usage:
+        async with dony.Session() as session:
+            await session.shell("cd /tmp && export FOO=bar")
+            await session.shell("echo $FOO from $(pwd)")
+    """
+
+    def __init__(
+        self,
+        *,
+        cwd: Optional[Union[str, Path]] = None,
+        envs: Optional[Mapping[str, str]] = None,
+        argv: Sequence[str] = ("bash", "--noprofile", "--norc"),
+        new_session: bool = True,
+    ):
+        """
+        Args:
+            cwd: Initial working directory of the session.
+            envs: Extra environment variables for the session (extends current environment).
+            argv: Command that starts the shell. It must read a bash script from stdin.
+            new_session: Starts the shell in its own session, so that stopping a command also
+                         stops its children. Disable if the shell needs the terminal
+                         (e.g. ssh asking for a password).
+        """
+        self.cwd = str(cwd) if cwd is not None else None
+        self.envs = envs
+        self.argv = list(argv)
+        self.new_session = new_session
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        """Start the shell process. Called automatically on the first command."""
+
+        if self._proc is not None and self._proc.returncode is None:
+            return
+
+        self._proc = await asyncio.create_subprocess_exec(
+            *self.argv,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=self.cwd,
+            env=build_env(self.envs),
+            start_new_session=self.new_session,
+        )
+        await self._send(_SETUP)
+
+    async def close(self) -> None:
+        """Stop the shell process and remove its state files."""
+
+        proc = self._proc
+        if proc is None or proc.returncode is not None:
+            self._proc = None
+            return
+
+        try:
+            await self._send('rm -rf "$__dony_dir"\nexit 0\n')
+            await asyncio.wait_for(proc.wait(), timeout=5)
+        except (OSError, asyncio.TimeoutError):
+            proc.kill()
+            await proc.wait()
+        finally:
+            self._proc = None
+
+    async def __aenter__(self) -> "Session":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _send(self, script: str) -> None:
+        assert self._proc is not None and self._proc.stdin is not None
+        self._proc.stdin.write(script.encode())
+        await self._proc.stdin.drain()
+
+    async def run(
+        self,
+        command: str,
+        reader: OutputReader,
+        *,
+        stderr_reader: Optional[OutputReader] = None,
+        run_from: Optional[Union[str, Path]] = None,
+        envs: Optional[Mapping[str, str]] = None,
+        new_session: bool = False,
+    ) -> int:
+        """
+        Run a prepared command line in the session, feeding its combined stdout+stderr to the reader.
+
+        `run_from` and `envs` apply to this command only. `stderr_reader` is not supported.
+        Cancelling the call kills the session shell, it restarts on the next command.
+
+        Returns:
+            The exit code.
+        """
+
+        # asyncio.Lock binds to the loop it is created in, so make one per loop
+        loop = asyncio.get_event_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+
+        async with self._lock:
+            await self.start()
+            assert self._proc is not None and self._proc.stdout is not None
+
+            # - Build the script: read the command verbatim, run it in a subshell, print a sentinel
+
+            token = os.urandom(16).hex()
+            save = "__dony_save"
+            if envs:
+                save = f"unset {' '.join(envs)}; {save}"
+            lines = [f"trap '{{ set +x; }} 2>/dev/null; {save}' EXIT"]
+            if run_from is not None:
+                lines.append(f"cd {shlex.quote(str(run_from))}")
+            for key, value in (envs or {}).items():
+                lines.append(f"export {key}={shlex.quote(value)}")
+            lines.append(command)
+
+            script = "\n".join(
+                [
+                    f"IFS= read -r -d '' __dony_cmd <<'__DONY_EOF_{token}'",
+                    *lines,
+                    f"__DONY_EOF_{token}",
+                    '(eval "$__dony_cmd") </dev/null 2>&1',
+                    "__dony_rc=$?",
+                    '. "$__dony_dir/env" 2>/dev/null',
+                    "" if run_from is not None else "__dony_restore_cwd",
+                    f"printf '\\0%s:%d\\n' {token} \"$__dony_rc\"",
+                    "",
+                ]
+            )
+            try:
+                await self._send(script)
+                return await self._read_output(token, reader)
+            except asyncio.CancelledError:
+                # The command may still be running: drop the shell, a new one starts on the next command
+                proc, self._proc = self._proc, None
+                if proc is not None:
+                    if self.new_session:
+                        signal_process_group(proc, signal.SIGKILL)
+                    elif proc.returncode is None:
+                        proc.kill()
+                    await proc.wait()
+                    # Also close the pipes, which processes the shell started may still hold
+                    transport = getattr(proc, "_transport", None)
+                    if transport is not None:
+                        transport.close()
+                    if self.new_session:
+                        reap_orphans(proc)
+                raise
+
+    async def _read_output(self, token: str, reader: OutputReader) -> int:
+        # - Read output until the sentinel, holding back a possible beginning of it
+
+        assert self._proc is not None and self._proc.stdout is not None
+
+        marker = b"\0" + token.encode() + b":"
+        pending = b""
+        while True:
+            data = await self._proc.stdout.read(CHUNK_SIZE)
+            if not data:
+                self._proc = None
+                raise RuntimeError("Dony session terminated unexpectedly")
+            pending += data
+
+            index = pending.find(marker)
+            if index == -1:
+                # Only a NUL near the end can be the beginning of a marker split across reads
+                cut = pending.find(b"\0", max(0, len(pending) - len(marker) + 1))
+                cut = len(pending) if cut == -1 else cut
+                reader.feed(pending[:cut])
+                pending = pending[cut:]
+                continue
+
+            end = pending.find(b"\n", index)
+            if end == -1:
+                continue
+
+            reader.feed(pending[:index])
+            return int(pending[index + len(marker) : end])
+
+
+async def example():
+    async with Session() as session:
+        # - Working directory and exported variables carry over
+
+        await session.shell("cd /tmp && export GREETING=hello", show_command=False)
+        output = await session.shell('echo "$GREETING from $(pwd)"')
+        assert output == "hello from /tmp", output
+
+        # - Failures don't kill the session
+
+        try:
+            await session.shell("echo 'this will fail' && false")
+            raise Exception("Should have failed")
+        except RuntimeError:
+            pass
+
+        # - Unset variables abort the command
+
+        try:
+            await session.shell("echo $NOT_SET_ANYWHERE", quiet=True)
+            raise Exception("Should have failed")
+        except RuntimeError:
+            pass
+
+        # - Per-call run_from and envs don't persist
+
+        assert await session.shell("pwd", run_from="/", quiet=True) == "/"
+        assert await session.shell("pwd", quiet=True) == "/tmp"
+        assert await session.shell("echo $X", envs={"X": "1"}, quiet=True) == "1"
+        assert await session.shell("echo ${X:-unset}", quiet=True) == "unset"
+
+
+if __name__ == "__main__":
+    asyncio.run(example())
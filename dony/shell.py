@@ -1,193 +1,637 @@
 from __future__ import annotations
 
 import asyncio
-import os
+import signal
+import sys
+from contextvars import ContextVar
 from pathlib import Path
 from textwrap import dedent
-from typing import Optional, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Literal,
+    Mapping,
+    Optional,
+    Pattern,
+    Sequence,
+    Union,
+    overload,
+)
+
+from dony.answers import MISSING, as_bool, provided_answer
+from dony.capture import Capture
+from dony.execution_log import ExecutionTimer, log_execution
+from dony.env import current_env
+from dony.executor import Executor, get_executor
+from dony.format_command import format_command
+from dony.output import output_manager
+from dony.output_reader import OutputReader
+from dony.recording import Replayer, recorder, replayer
+from dony.shell_policy import shell_policy
+from dony.shell_result import ShellResult
+from dony.watcher import Watcher
+
+if TYPE_CHECKING:
+    from dony.session import Session
+
+
+# Set by `dony.run` while independent commands may run concurrently, so that a failing one
+# also stops the processes started by the others
+_new_session: ContextVar[bool] = ContextVar("dony_new_session", default=False)
+
+
+class ShellError(RuntimeError):
+    """Raised when a shell command exits with a non-zero status."""
+
+    def __init__(
+        self,
+        message: str = "Dony command failed",
+        *,
+        command: str = "",
+        output: str = "",
+        stderr: str = "",
+        return_code: int = 1,
+        attempts: int = 1,
+    ):
+        super().__init__(message)
+        self.command = command
+        self.output = output
+        self.stderr = stderr
+        self.return_code = return_code
+        self.attempts = attempts
+
+
+class ShellTimeoutError(ShellError):
+    """Raised when a shell command runs longer than its timeout. The command is terminated."""
+
+
+async def print_shell_message(message: str) -> None:
+    """Print a message in the color used for shell commands."""
+
+    # Plain ANSI escapes instead of prompt_toolkit, so that shell calls don't load it
+    text = output_manager.prefix(dedent(message).strip())
+    if sys.stdout.isatty():
+        text = f"\033[35m{text}\033[0m"
+    output_manager.write_now(text + "\n")
+
+
+def build_command(
+    command: str,
+    *,
+    abort_on_failure: bool = True,
+    abort_on_unset_variable: bool = True,
+    trace_execution: bool = False,
+) -> str:
+    """Dedent the command and prepend the `set` prefix for the enabled flags."""
 
-import questionary
+    # - Build the `set` prefix from the enabled flags
 
-from dony.prompts.error import error as dony_error
-from dony.prompts.echo import echo as dony_print
-from dony.prompts.confirm import confirm as dony_confirm
+    flags = "".join(
+        flag
+        for flag, enabled in (
+            ("e", abort_on_failure),
+            ("u", abort_on_unset_variable),
+            ("x", trace_execution),
+        )
+        if enabled
+    )
+    prefix = f"set -{flags}; " if flags else ""
+
+    # - Dedent and combine the command
+
+    return prefix + dedent(command.strip())
 
 
+@overload
 async def shell(
     command: str,
     *,
     run_from: Optional[Union[str, Path]] = None,
-    envs: Optional[dict[str, str]] = None,
+    envs: Optional[Mapping[str, str]] = None,
     dry_run: bool = False,
     quiet: bool = False,
-    capture_output: bool = True,
+    capture_output: Union[bool, Capture] = True,
     abort_on_failure: bool = True,
     abort_on_unset_variable: bool = True,
     trace_execution: bool = False,
     show_command: bool = True,
     confirm: bool = False,
-) -> str:
+    session: Optional[Session] = None,
+    executor: Optional[Executor] = None,
+    errors: str = "replace",
+    separate_stderr: Literal[True],
+    quiet_stderr: Optional[bool] = None,
+    capture_stderr: Optional[Union[bool, Capture]] = None,
+    until: Optional[Union[str, Pattern[str], Callable[[str], Any]]] = None,
+    watch: Sequence[Watcher] = (),
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+    new_session: bool = False,
+    result: bool = False,
+) -> ShellResult: ...
+
+
+@overload
+async def shell(
+    command: str,
+    *,
+    run_from: Optional[Union[str, Path]] = None,
+    envs: Optional[Mapping[str, str]] = None,
+    dry_run: bool = False,
+    quiet: bool = False,
+    capture_output: Union[bool, Capture] = True,
+    abort_on_failure: bool = True,
+    abort_on_unset_variable: bool = True,
+    trace_execution: bool = False,
+    show_command: bool = True,
+    confirm: bool = False,
+    session: Optional[Session] = None,
+    executor: Optional[Executor] = None,
+    errors: str = "replace",
+    separate_stderr: bool = False,
+    quiet_stderr: Optional[bool] = None,
+    capture_stderr: Optional[Union[bool, Capture]] = None,
+    until: Optional[Union[str, Pattern[str], Callable[[str], Any]]] = None,
+    watch: Sequence[Watcher] = (),
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+    new_session: bool = False,
+    result: Literal[True],
+) -> ShellResult: ...
+
+
+@overload
+async def shell(
+    command: str,
+    *,
+    run_from: Optional[Union[str, Path]] = None,
+    envs: Optional[Mapping[str, str]] = None,
+    dry_run: bool = False,
+    quiet: bool = False,
+    capture_output: Union[bool, Capture] = True,
+    abort_on_failure: bool = True,
+    abort_on_unset_variable: bool = True,
+    trace_execution: bool = False,
+    show_command: bool = True,
+    confirm: bool = False,
+    session: Optional[Session] = None,
+    executor: Optional[Executor] = None,
+    errors: str = "replace",
+    separate_stderr: Literal[False] = False,
+    quiet_stderr: Optional[bool] = None,
+    capture_stderr: Optional[Union[bool, Capture]] = None,
+    until: Optional[Union[str, Pattern[str], Callable[[str], Any]]] = None,
+    watch: Sequence[Watcher] = (),
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+    new_session: bool = False,
+    result: Literal[False] = False,
+) -> str: ...
+
+
+@overload
+async def shell(
+    command: str,
+    *,
+    run_from: Optional[Union[str, Path]] = None,
+    envs: Optional[Mapping[str, str]] = None,
+    dry_run: bool = False,
+    quiet: bool = False,
+    capture_output: Union[bool, Capture] = True,
+    abort_on_failure: bool = True,
+    abort_on_unset_variable: bool = True,
+    trace_execution: bool = False,
+    show_command: bool = True,
+    confirm: bool = False,
+    session: Optional[Session] = None,
+    executor: Optional[Executor] = None,
+    errors: str = "replace",
+    separate_stderr: bool = False,
+    quiet_stderr: Optional[bool] = None,
+    capture_stderr: Optional[Union[bool, Capture]] = None,
+    until: Optional[Union[str, Pattern[str], Callable[[str], Any]]] = None,
+    watch: Sequence[Watcher] = (),
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+    new_session: bool = False,
+    result: bool = False,
+) -> Union[str, ShellResult]: ...
+
+
+async def shell(
+    command: str,
+    *,
+    run_from: Optional[Union[str, Path]] = None,
+    envs: Optional[Mapping[str, str]] = None,
+    dry_run: bool = False,
+    quiet: bool = False,
+    capture_output: Union[bool, Capture] = True,
+    abort_on_failure: bool = True,
+    abort_on_unset_variable: bool = True,
+    trace_execution: bool = False,
+    show_command: bool = True,
+    confirm: bool = False,
+    session: Optional[Session] = None,
+    executor: Optional[Executor] = None,
+    errors: str = "replace",
+    separate_stderr: bool = False,
+    quiet_stderr: Optional[bool] = None,
+    capture_stderr: Optional[Union[bool, Capture]] = None,
+    until: Optional[Union[str, Pattern[str], Callable[[str], Any]]] = None,
+    watch: Sequence[Watcher] = (),
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+    new_session: bool = False,
+    result: bool = False,
+) -> Union[str, ShellResult]:
     """
     Execute a shell command, streaming its output to stdout as it runs,
     and automatically applying 'set -e', 'set -u' and/or 'set -x' as requested.
 
+    Each call is timed and logged, see `dony.configure_execution_log` and `dony.execution_summary`.
+
     Args:
         command: The command line string to execute.
         run_from: Changes the working directory before executing the command.
-        envs: Extra environment variables to pass to the command (extends current environment).
+        envs: Extra environment variables to pass to the command (extends current environment
+              and `dony.env` blocks).
         dry_run: Prints the command without executing it.
         quiet: Suppresses output.
         capture_output: Captures and returns the full combined stdout+stderr;
                         if False, prints only and returns None.
+                        Pass a `dony.TailCapture`, `dony.HeadTailCapture` or `dony.FileCapture`
+                        to bound memory use on huge outputs.
         abort_on_failure: Prepends 'set -e' (aborts on first command error).
         abort_on_unset_variable: Prepends 'set -u' (aborts on unset variable).
         trace_execution: Prepends 'set -x' (traces command execution at shell level).
         show_command: Shows the formatted command before executing it.
         confirm: Asks for confirmation before executing the command.
+        session: Runs the command in a persistent `dony.Session` instead of a new process.
+        executor: Runs the command with this `dony.Executor`, e.g. a `dony.SSHExecutor`.
+                  Defaults to the one set with `dony.use_executor`, or a new local process.
+        errors: How to handle output that is not valid UTF-8 ("replace", "ignore", "strict", ...).
+        separate_stderr: Keeps stderr apart from stdout (printed to stderr) and returns a `dony.ShellResult`.
+                         Both pipes are drained concurrently. Not supported with `session`
+                         and remote executors.
+        quiet_stderr: Suppresses stderr output when separate_stderr=True. Defaults to `quiet`.
+        capture_stderr: Capture policy for stderr when separate_stderr=True. By default, stderr is
+                        captured in memory if `capture_output` is not False.
+        until: Stops the command at the first output line matching this regex (or function),
+               and returns the output up to it. Stopping is not a failure.
+        watch: `dony.Watcher`s checking each output line, e.g. to wait until a server is ready
+               or to fail on an error message.
+        timeout: Seconds an attempt may run. Then its process group gets SIGTERM, and SIGKILL
+                 after a grace period. Defaults to `dony.configure_shell` (no timeout); 0 for none.
+        retries: How many times to run the command again after a non-zero exit code or a timeout.
+                 Defaults to `dony.configure_shell` (0).
+        backoff: Seconds to wait before the first retry, doubled before each next one.
+                 Defaults to `dony.configure_shell` (1).
+        new_session: Runs the command in its own session even when stdin is a terminal, so that
+                     cancelling the call (e.g. a failing sibling in `asyncio.gather`) also stops
+                     the processes it started. Implied by `until`, `watch` and `timeout`, and set
+                     by `dony.shell_many` and for concurrent commands of `dony.run`.
+        result: Returns a `dony.ShellResult` instead of a string: the exit code, timings and
+                the raw output, decoded and parsed only on access (`.text`, `.lines()`,
+                `.split()`, `.json()`).
 
     Returns:
         The full command output as a string. Returns empty string if no output or capture_output=False.
+        With result=True or separate_stderr=True, a `dony.ShellResult` (with separate stdout
+        and stderr for the latter).
 
     Raises:
-        RuntimeError: If the command exits with a non-zero status.
-        KeyboardInterrupt: If the command is interrupted by the user.
+        ShellError: If the command exits with a non-zero status (a RuntimeError subclass
+                    carrying the captured output, return code and number of attempts).
+        ShellTimeoutError: If the last attempt timed out (a `ShellError` subclass).
+        KeyboardInterrupt: If the command is interrupted with SIGINT (exit code 130).
     """
 
-    # - Get formatted command if needed
+    executor = executor or session or get_executor()
+    if separate_stderr and not executor.supports_separate_stderr:
+        raise ValueError(
+            f"separate_stderr is not supported with {type(executor).__name__}"
+        )
 
-    if show_command or dry_run:
-        # if is required to avoid recursion
-        try:
-            formatted_command = await shell(
-                f"""
-                    shfmt << 'EOF'
-                    {command}
-                """,
-                quiet=True,
-                show_command=False,
-            )
+    # A `Capture` holds a single stream, so stderr gets its own in-memory capture by default
+    if capture_stderr is None:
+        capture_stderr = bool(capture_output)
+    elif isinstance(capture_stderr, Capture) and capture_stderr is capture_output:
+        raise ValueError("capture_output and capture_stderr must be different captures")
 
-            if not formatted_command:
-                raise Exception("Failed to format command")
+    # - Get formatted command if needed
 
-        except Exception:
-            formatted_command = command
+    if show_command or dry_run:
+        formatted_command = await format_command(command)
     else:
         formatted_command = command
 
     # - Process dry_run
 
     if dry_run:
-        await dony_print(
-            "🐚 Dry run\n" + formatted_command,
-            style=questionary.Style(
-                [
-                    ("question", "fg:ansipurple"),
-                ]
-            ),
-        )
+        await print_shell_message("🐚 Dry run\n" + formatted_command)
 
-        return ""
+        return _empty_result(command) if separate_stderr or result else ""
 
     # - Print command
 
     if (show_command and not quiet) or confirm:
-        await dony_print(
-            "🐚\n" + formatted_command,
-            style=questionary.Style(
-                [
-                    ("question", "fg:ansipurple"),
-                ]
-            ),
-        )
+        await print_shell_message("🐚\n" + formatted_command)
 
     if confirm:
-        if not await dony_confirm(
-            "Are you sure you want to run the above command?",
+        from dony.prompts.confirm import confirm as dony_confirm
+        from dony.prompts.error import error as dony_error
+
+        message = "Are you sure you want to run the above command?"
+
+        # Only an explicit answer runs the command without asking, never a default
+        # (with defaults used and no answer, this raises `dony.AnswerError`)
+        answer = provided_answer("confirm", message)
+        if not (
+            as_bool(answer) if answer is not MISSING else await dony_confirm(message)
         ):
             await dony_error("Aborted")
-            return ""
+            return _empty_result(command) if separate_stderr or result else ""
 
     # - Convert run_from to string
 
     if isinstance(run_from, Path):
         run_from = str(run_from)
 
-    # - Build the `set` prefix from the enabled flags
+    # - Build the full command line
 
-    flags = "".join(
-        flag
-        for flag, enabled in (
-            ("e", abort_on_failure),
-            ("u", abort_on_unset_variable),
-            ("x", trace_execution),
-        )
-        if enabled
+    full_cmd = build_command(
+        command,
+        abort_on_failure=abort_on_failure,
+        abort_on_unset_variable=abort_on_unset_variable,
+        trace_execution=trace_execution,
     )
-    prefix = f"set -{flags}; " if flags else ""
 
-    # - Dedent and combine the command
+    # - Set up watchers: the first one with a "stop" or "raise" action to match stops the command
 
-    full_cmd = prefix + dedent(command.strip())
+    watchers = list(watch)
+    if until is not None:
+        watchers.append(Watcher(until, action="stop"))
 
-    # - Build environment
+    # - Execute, or serve the result from a trace in replay mode, retrying failed attempts
 
-    env = {**os.environ, **(envs or {})}
+    policy = shell_policy(timeout=timeout, retries=retries, backoff=backoff)
+    active_recorder = recorder()
+    active_replayer = replayer()
+    entry = {"type": "shell", "command": command, "cwd": run_from}
 
-    # - Execute with optional working directory
+    attempt = 1
+    try:
+        while True:
+            stopped_by: Optional["asyncio.Future[Watcher]"] = (
+                asyncio.get_event_loop().create_future() if watchers else None
+            )
 
-    proc = await asyncio.create_subprocess_shell(
-        full_cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.STDOUT,
-        cwd=run_from,
-        env=env,
-    )
+            def on_match(watcher: Watcher) -> None:
+                if watcher.action != "notify" and stopped_by and not stopped_by.done():
+                    stopped_by.set_result(watcher)
+
+            reader = OutputReader(
+                quiet=quiet,
+                capture_output=capture_output,
+                errors=errors,
+                watchers=watchers,
+                on_match=on_match,
+                record_output=active_recorder is not None,
+            )
+            stderr_reader = (
+                OutputReader(
+                    quiet=quiet if quiet_stderr is None else quiet_stderr,
+                    capture_output=capture_stderr,
+                    errors=errors,
+                    stream=sys.stderr,
+                    watchers=watchers,
+                    on_match=on_match,
+                    record_output=active_recorder is not None,
+                )
+                if separate_stderr
+                else None
+            )
+            timer = ExecutionTimer()
+            run = (
+                _replay(active_replayer, entry, reader, stderr_reader)
+                if active_replayer is not None
+                else executor.run(
+                    full_cmd,
+                    reader,
+                    stderr_reader=stderr_reader,
+                    run_from=run_from,
+                    envs=current_env(envs),
+                    # In its own session, the command is stopped together with its children
+                    new_session=new_session
+                    or _new_session.get()
+                    or bool(watchers)
+                    or policy.timeout is not None,
+                )
+            )
+            if policy.timeout is not None:
+                run = asyncio.wait_for(run, policy.timeout)
+
+            timed_out = False
+            try:
+                return_code = (
+                    await _run_until_stopped(run, stopped_by)
+                    if stopped_by is not None
+                    else await run
+                )
+            except asyncio.TimeoutError:
+                timed_out, return_code = True, -signal.SIGTERM
+            # Output is decoded only when it's needed, see below
+            reader.finish()
+            if stderr_reader is not None:
+                stderr_reader.finish()
+
+            watcher = stopped_by.result() if stopped_by and stopped_by.done() else None
+
+            if active_recorder is not None and active_replayer is None:
+                active_recorder.write(
+                    {
+                        **entry,
+                        "envs": dict(current_env(envs)),
+                        "return_code": return_code,
+                        "output": reader.recorded_output(),
+                        **(
+                            {"stderr": stderr_reader.recorded_output()}
+                            if stderr_reader is not None
+                            else {}
+                        ),
+                        **({"timed_out": True} if timed_out else {}),
+                    }
+                )
+
+            # - Log execution
+
+            readers = [reader] if stderr_reader is None else [reader, stderr_reader]
+            first_bytes = [
+                r.first_byte_at for r in readers if r.first_byte_at is not None
+            ]
+            record = timer.record(
+                command=command,
+                return_code=return_code,
+                output_bytes=sum(r.n_bytes for r in readers),
+                first_byte_at=min(first_bytes) if first_bytes else None,
+                cwd=run_from,
+                attempt=attempt,
+                timed_out=timed_out,
+            )
+            log_execution(record)
 
-    # - Capture output
+            # - Retry a non-zero exit code or a timeout, unless the user interrupted it
 
-    buffer = []
-    if proc.stdout is None:
-        raise RuntimeError("Process stdout is unexpectedly None")
-    while True:
-        try:
-            line_bytes = await proc.stdout.readline()
-            if not line_bytes:
+            if (
+                return_code == 0
+                or watcher is not None
+                or attempt > policy.retries
+                or _interrupted(return_code)
+            ):
                 break
-            line = line_bytes.decode()
-            if not quiet:
-                print(line, end="")
-            if capture_output:
-                buffer.append(line)
-        except UnicodeDecodeError:
-            await dony_error("Error decoding output. Skipping the line")
 
-    return_code = await proc.wait()
+            delay = policy.delay(attempt)
+            if not quiet:
+                reason = (
+                    "Timed out" if timed_out else f"Failed with exit code {return_code}"
+                )
+                await print_shell_message(
+                    f"🐚 {reason}, retrying in {delay:g}s "
+                    f"(attempt {attempt + 1} of {policy.retries + 1})"
+                )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+            # Captures passed in are kept across attempts: drop the output of the failed one
+            for capture in (capture_output, capture_stderr):
+                if isinstance(capture, Capture):
+                    capture.reset()
+    finally:
+        for pending in watchers:
+            pending.finish()
+
+    # - Raise on an error pattern, a timeout or a non-zero exit code
+
+    if timed_out or return_code != 0 or watcher is not None:
+        output = reader.text().strip()
+        stderr_output = (
+            stderr_reader.text().strip() if stderr_reader is not None else ""
+        )
 
-    output = "".join(buffer) if capture_output else ""
+    if watcher is not None and watcher.action == "raise":
+        raise ShellError(
+            f"Dony command output matched {watcher.pattern!r}",
+            command=command,
+            output=output,
+            stderr=stderr_output,
+            return_code=return_code,
+            attempts=attempt,
+        )
 
-    # - Raise if exit code is non-zero
+    if timed_out:
+        raise ShellTimeoutError(
+            f"Dony command timed out after {policy.timeout:g}s"
+            if policy.timeout is not None
+            else "Dony command timed out",
+            command=command,
+            output=output,
+            stderr=stderr_output,
+            return_code=return_code,
+            attempts=attempt,
+        )
 
-    if return_code != 0:
-        if output and "KeyboardInterrupt" in output:
+    if return_code != 0 and watcher is None:
+        if _interrupted(return_code):
             raise KeyboardInterrupt
-        raise RuntimeError("Dony command failed")
+        raise ShellError(
+            command=command,
+            output=output,
+            stderr=stderr_output,
+            return_code=return_code,
+            attempts=attempt,
+        )
 
     # - Print closing message
 
     if show_command and not quiet:
-        await dony_print(
-            "—" * 80,
-            style=questionary.Style(
-                [
-                    ("question", "fg:ansipurple"),
-                ]
-            ),
-        )
+        await print_shell_message("—" * 80)
 
     # - Return output
 
-    return output.strip()
+    if result or stderr_reader is not None:
+        return ShellResult(
+            command=command,
+            return_code=return_code,
+            raw_stdout=reader.data(),
+            raw_stderr=stderr_reader.data() if stderr_reader is not None else b"",
+            duration=record.duration,
+            time_to_first_byte=record.time_to_first_byte,
+            stdout_bytes=reader.n_bytes,
+            stderr_bytes=stderr_reader.n_bytes if stderr_reader is not None else 0,
+            attempts=attempt,
+            errors=errors,
+        )
+
+    return reader.text().strip()
+
+
+def _interrupted(return_code: int) -> bool:
+    """Whether the command was stopped with SIGINT: killed by it, or exited as a shell does then."""
+    return return_code in (-signal.SIGINT, 128 + signal.SIGINT)
+
+
+def _empty_result(command: str) -> ShellResult:
+    return ShellResult(
+        command=command,
+        return_code=0,
+        raw_stdout=b"",
+        raw_stderr=b"",
+        duration=0.0,
+        time_to_first_byte=None,
+        stdout_bytes=0,
+        stderr_bytes=0,
+    )
+
+
+async def _replay(
+    replayer: Replayer,
+    entry: dict,
+    reader: OutputReader,
+    stderr_reader: Optional[OutputReader],
+) -> int:
+    """Feed a recorded result to the readers instead of running the command."""
+
+    recorded = replayer.take(entry)
+    reader.feed(recorded["output"].encode())
+    (stderr_reader or reader).feed(recorded.get("stderr", "").encode())
+    if recorded.get("timed_out"):
+        raise asyncio.TimeoutError
+    return recorded["return_code"]
+
+
+async def _run_until_stopped(
+    run: Awaitable[int],
+    stopped_by: "asyncio.Future[Watcher]",
+) -> int:
+    """Wait for the command to exit, or stop it when a watcher matches (exit code -SIGTERM)."""
+
+    task = asyncio.ensure_future(run)
+    try:
+        await asyncio.wait([task, stopped_by], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Stops the command on a match, and also when the caller is cancelled
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    return -signal.SIGTERM if task.cancelled() else task.result()
 
 
 async def example():
@@ -222,6 +666,16 @@ async def example():
     except RuntimeError:
         pass
 
+    # - Keep stderr separate
+
+    result = await shell(
+        "echo data; echo diagnostics >&2",
+        separate_stderr=True,
+        quiet_stderr=True,
+    )
+    assert isinstance(result, ShellResult)
+    assert (result.stdout, result.stderr) == ("data\n", "diagnostics\n"), result
+
 
 if __name__ == "__main__":
     asyncio.run(example())
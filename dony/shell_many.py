@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import List, Mapping, Optional, Sequence, Union
+
+from dony.format_command import format_command
+from dony.output import output_manager
+from dony.shell import ShellError, print_shell_message, shell
+
+
+async def shell_many(
+    commands: Sequence[str],
+    *,
+    concurrency: int = 4,
+    fail_fast: bool = True,
+    run_from: Optional[Union[str, Path]] = None,
+    envs: Optional[Mapping[str, str]] = None,
+    quiet: bool = False,
+    abort_on_failure: bool = True,
+    abort_on_unset_variable: bool = True,
+    trace_execution: bool = False,
+    show_command: bool = True,
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+) -> List[Union[str, BaseException]]:
+    """
+    Execute several shell commands concurrently through `dony.shell`.
+
+    Output of each command is captured and printed as one block once the command finishes,
+    so lines of different commands never interleave.
+
+    Args:
+        commands: The command line strings to execute.
+        concurrency: Maximum number of commands running at the same time.
+        fail_fast: If True, cancels the remaining commands and raises on the first failure.
+                   If False, runs every command and returns exceptions in place of outputs
+                   (like `asyncio.gather(..., return_exceptions=True)`).
+        run_from: Changes the working directory before executing the commands.
+        envs: Extra environment variables to pass to the commands.
+        quiet: Suppresses output.
+        abort_on_failure: Prepends 'set -e' (aborts on first command error).
+        abort_on_unset_variable: Prepends 'set -u' (aborts on unset variable).
+        trace_execution: Prepends 'set -x' (traces command execution at shell level).
+        show_command: Shows the formatted command above its output.
+        timeout: Seconds an attempt of each command may run (see `dony.shell`).
+        retries: How many times to run a failed or timed out command again.
+        backoff: Seconds to wait before the first retry, doubled before each next one.
+
+    Returns:
+        Outputs of the commands, in the order of `commands`.
+
+    Raises:
+        ShellError: If a command fails and fail_fast is True.
+    """
+
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    # - Run a single command and print its output as one block
+
+    async def _run(command: str) -> str:
+        async with semaphore:
+            error: Optional[ShellError] = None
+            output: str
+            try:
+                output = await shell(
+                    command,
+                    run_from=run_from,
+                    envs=envs,
+                    quiet=True,
+                    capture_output=True,
+                    abort_on_failure=abort_on_failure,
+                    abort_on_unset_variable=abort_on_unset_variable,
+                    trace_execution=trace_execution,
+                    show_command=False,
+                    # Captured commands don't need the terminal, and a failing one has to
+                    # stop the processes started by the others too
+                    new_session=True,
+                    timeout=timeout,
+                    retries=retries,
+                    backoff=backoff,
+                )
+            except ShellError as e:
+                output, error = e.output, e
+
+            if not quiet:
+                # Format first: printing the block must not yield to other commands
+                formatted_command = (
+                    await format_command(command) if show_command else ""
+                )
+                if show_command:
+                    await print_shell_message("🐚\n" + formatted_command)
+                if output:
+                    output_manager.write(output + "\n")
+                if show_command:
+                    await print_shell_message("—" * 80)
+
+            if error is not None:
+                raise error
+
+            return output
+
+    # - Start all commands
+
+    tasks = [asyncio.ensure_future(_run(command)) for command in commands]
+
+    if not tasks:
+        return []
+
+    # - Collect all results
+
+    if not fail_fast:
+        return list(await asyncio.gather(*tasks, return_exceptions=True))
+
+    # - Fail fast: cancel the rest on the first failure
+
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    for task in done:
+        exception = task.exception()
+        if exception is not None:
+            for other in pending:
+                other.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise exception
+
+    return [task.result() for task in tasks]
+
+
+async def example():
+    # - Run commands concurrently, output is grouped per command
+
+    outputs = await shell_many(
+        [
+            "sleep 0.3; echo first",
+            "sleep 0.1; echo second",
+            "echo third",
+        ],
+        concurrency=2,
+    )
+    assert outputs == ["first", "second", "third"], outputs
+
+    # - Collect failures instead of raising
+
+    results = await shell_many(
+        ["echo ok", "echo oops && false"],
+        fail_fast=False,
+        quiet=True,
+    )
+    assert results[0] == "ok"
+    assert isinstance(results[1], ShellError) and results[1].output == "oops"
+
+    # - Fail fast: processes started by the cancelled commands are stopped too, even with
+    #   an executor that keeps commands in the terminal's process group
+
+    import os
+    import tempfile
+
+    from dony.executor import LocalExecutor, use_executor
+
+    with tempfile.TemporaryDirectory() as directory:
+        pid_file = os.path.join(directory, "pid")
+        with use_executor(LocalExecutor(new_session=False)):
+            try:
+                await shell_many(
+                    [
+                        f"sh -c 'echo $$ > {pid_file}; exec sleep 31' & wait",
+                        "sleep 0.3; false",
+                    ],
+                    quiet=True,
+                )
+                raise Exception("Should have failed")
+            except ShellError:
+                pass
+        with open(pid_file) as f:
+            pid = int(f.read())
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # A zombie has been stopped, and is only waiting for its parent to collect it
+            assert f.read().split()[2] == "Z", f"grandchild {pid} is still running"
+    except FileNotFoundError:
+        pass
+
+
+if __name__ == "__main__":
+    asyncio.run(example())
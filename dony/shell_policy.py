@@ -0,0 +1,77 @@
+import os
+from dataclasses import dataclass, replace
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class ShellPolicy:
+    """Timeout and retries of `dony.shell` calls."""
+
+    timeout: Optional[float] = None  # seconds per attempt, None for no timeout
+    retries: int = 0  # attempts after the first one fails
+    backoff: float = 1.0  # seconds before the first retry, doubled before each next one
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retrying after the failed attempt number `attempt` (from 1)."""
+        return self.backoff * 2 ** (attempt - 1)
+
+
+_defaults = ShellPolicy(
+    timeout=float(os.environ["DONY_TIMEOUT"])
+    if os.environ.get("DONY_TIMEOUT")
+    else None,
+    retries=int(os.environ.get("DONY_RETRIES") or 0),
+)
+
+
+def configure_shell(
+    *,
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+) -> None:
+    """
+    Set the defaults for timeout and retries of `dony.shell` calls. Arguments of a call override them.
+
+    Args:
+        timeout: Seconds an attempt may run before its process group is terminated (SIGTERM,
+                 then SIGKILL after a grace period). 0 for no timeout.
+                 Can also be set with the `DONY_TIMEOUT` environment variable.
+        retries: How many times a failed or timed out command is run again.
+                 Can also be set with the `DONY_RETRIES` environment variable.
+        backoff: Seconds to wait before the first retry, doubled before each next one.
+    """
+
+    global _defaults
+
+    _defaults = shell_policy(timeout=timeout, retries=retries, backoff=backoff)
+
+
+def shell_policy(
+    *,
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+) -> ShellPolicy:
+    """The defaults, overridden with the arguments that are not None."""
+
+    if retries is not None and retries < 0:
+        raise ValueError("retries must be 0 or more")
+
+    policy = _defaults
+    if timeout is not None:
+        policy = replace(policy, timeout=timeout or None)
+    if retries is not None:
+        policy = replace(policy, retries=retries)
+    if backoff is not None:
+        policy = replace(policy, backoff=backoff)
+    return policy
+
+
+def test():
+    assert shell_policy(retries=3, backoff=0.5).delay(3) == 2.0
+    assert shell_policy(timeout=0).timeout is None
+
+
+if __name__ == "__main__":
+    test()
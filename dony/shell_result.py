@@ -0,0 +1,84 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class ShellResult:
+    """
+    Structured result of a shell command, returned by `dony.shell(..., result=True)`
+    and `dony.shell(..., separate_stderr=True)`.
+
+    Keeps the captured output as raw bytes. It is decoded on first access of `stdout`/`stderr`/`text`,
+    and the parsing helpers cache their results, so a large output is decoded and parsed once at most.
+    """
+
+    command: str
+    return_code: int
+    # Captured stdout (all output without separate_stderr) and stderr
+    raw_stdout: bytes = field(repr=False)
+    raw_stderr: bytes = field(repr=False)
+    duration: float  # seconds from start to exit
+    time_to_first_byte: Optional[
+        float
+    ]  # seconds from start to the first output byte, on either stream
+    stdout_bytes: int  # bytes produced, including those a bounded capture dropped
+    stderr_bytes: int
+    attempts: int = 1  # 1 + retries made
+    errors: str = "replace"  # how invalid UTF-8 is decoded
+    _cache: Dict[Tuple[Any, ...], Any] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    @property
+    def ok(self) -> bool:
+        return self.return_code == 0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Output throughput over both streams."""
+        n_bytes = self.stdout_bytes + self.stderr_bytes
+        return n_bytes / self.duration if self.duration > 0 else 0.0
+
+    def _cached(self, key: Tuple[Any, ...], compute) -> Any:
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def stdout(self) -> str:
+        """Decoded stdout (all output without separate_stderr)."""
+        return self._cached(
+            ("stdout",), lambda: self.raw_stdout.decode("utf-8", errors=self.errors)
+        )
+
+    @property
+    def stderr(self) -> str:
+        """Decoded stderr (empty without separate_stderr)."""
+        return self._cached(
+            ("stderr",), lambda: self.raw_stderr.decode("utf-8", errors=self.errors)
+        )
+
+    @property
+    def text(self) -> str:
+        """Stripped stdout, as `dony.shell` returns it without `result=True`."""
+        return self._cached(("text",), lambda: self.stdout.strip())
+
+    def __str__(self) -> str:
+        return self.text
+
+    def lines(self) -> List[str]:
+        """Lines of `text`. Cached: every call returns the same list."""
+        return self._cached(("lines",), lambda: self.text.splitlines())
+
+    def split(self, sep: Optional[str] = None, maxsplit: int = -1) -> List[str]:
+        """`text.split(sep, maxsplit)`. Cached: every call with the same arguments returns the same list."""
+        return self._cached(
+            ("split", sep, maxsplit), lambda: self.text.split(sep, maxsplit)
+        )
+
+    def json(self) -> Any:
+        """stdout parsed as JSON, straight from the raw bytes. Cached: every call returns the same object."""
+
+        import json
+
+        return self._cached(("json",), lambda: json.loads(self.raw_stdout))
@@ -0,0 +1,413 @@
+from __future__ import annotations
+
+import asyncio
+import codecs
+import signal
+from collections import deque
+from pathlib import Path
+from typing import Awaitable, Deque, List, Mapping, Optional, Union, cast
+
+from dony.env import build_env, current_env
+from dony.executor import Executor, LocalExecutor, get_executor
+from dony.format_command import format_command
+from dony.output_reader import CHUNK_SIZE, OutputReader
+from dony.process import terminate_process
+from dony.recording import Recorder, recorder, replayer
+from dony.shell import (
+    ShellError,
+    ShellTimeoutError,
+    _replay,
+    build_command,
+    print_shell_message,
+)
+from dony.shell_policy import shell_policy
+
+
+class _QueueReader(OutputReader):
+    """Passes the output of a command run by an executor on to a `ShellStream`."""
+
+    def __init__(self, queue: "asyncio.Queue[bytes]"):
+        super().__init__(quiet=True, capture_output=False)
+        self.queue = queue
+
+    def feed(self, data: bytes) -> None:
+        if data:
+            self.queue.put_nowait(data)
+
+
+class ShellStream:
+    """
+    Output of a running shell command, as an async iterator of lines or chunks.
+
+    Closing the stream (leaving `async with`, calling `aclose()` or cancelling the task
+    that iterates it) kills the command. Exhausting a stream of a failed command raises `ShellError`,
+    and reading past the timeout kills the command and raises `ShellTimeoutError`.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        *,
+        run_from: Optional[Union[str, Path]] = None,
+        envs: Optional[Mapping[str, str]] = None,
+        lines: bool = True,
+        errors: str = "replace",
+        abort_on_failure: bool = True,
+        abort_on_unset_variable: bool = True,
+        trace_execution: bool = False,
+        show_command: bool = True,
+        executor: Optional[Executor] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.command = command
+        self.run_from = str(run_from) if run_from is not None else None
+        self.envs = current_env(envs)
+        self.lines = lines
+        self.abort_on_failure = abort_on_failure
+        self.abort_on_unset_variable = abort_on_unset_variable
+        self.trace_execution = trace_execution
+        self.show_command = show_command
+        self.executor = executor or get_executor()
+        self.timeout = shell_policy(timeout=timeout).timeout
+        self._deadline: Optional[float] = None
+        self._timed_out = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors=errors)
+        self._started = False
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._task: Optional["asyncio.Future[int]"] = None
+        self._queue: Optional["asyncio.Queue[bytes]"] = None
+        self._recorder: Optional[Recorder] = None
+        self._recorded: List[bytes] = []
+        self._items: Deque[str] = deque()
+        self._partial_line = ""
+        self._eof = False
+
+    @property
+    def return_code(self) -> Optional[int]:
+        """Exit code of the command, or None while it is running."""
+
+        if self._proc is not None:
+            return self._proc.returncode
+        if self._task is not None and self._task.done():
+            return -signal.SIGTERM if self._task.cancelled() else self._task.result()
+        return None
+
+    async def start(self) -> None:
+        """Start the command. Called automatically when iteration begins."""
+
+        if self._started:
+            return
+        self._started = True
+
+        # - Print command
+
+        if self.show_command:
+            await print_shell_message("🐚\n" + await format_command(self.command))
+
+        command = build_command(
+            self.command,
+            abort_on_failure=self.abort_on_failure,
+            abort_on_unset_variable=self.abort_on_unset_variable,
+            trace_execution=self.trace_execution,
+        )
+
+        if self.timeout is not None:
+            self._deadline = asyncio.get_event_loop().time() + self.timeout
+
+        # - Replayed output and other executors are passed on through a queue, from a task
+        #   that runs in the background
+
+        active_replayer = replayer()
+        self._recorder = recorder() if active_replayer is None else None
+        if active_replayer is not None or type(self.executor) is not LocalExecutor:
+            queue = cast("asyncio.Queue[bytes]", asyncio.Queue())
+            self._queue = queue
+            self._task = asyncio.ensure_future(
+                self._run(
+                    _replay(active_replayer, self._entry(), _QueueReader(queue), None)
+                    if active_replayer is not None
+                    else self.executor.run(
+                        command,
+                        _QueueReader(queue),
+                        run_from=self.run_from,
+                        envs=self.envs,
+                        new_session=True,
+                    )
+                )
+            )
+            return
+
+        # - Local commands are read straight from the pipe, so a slow consumer also slows
+        #   down the command instead of buffering its output. The process runs in its own
+        #   session, so that it can be killed with all its children
+
+        self._proc = await asyncio.create_subprocess_shell(
+            command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=self.run_from,
+            env=build_env(self.envs),
+            start_new_session=True,
+        )
+
+    async def aclose(self) -> None:
+        """Kill the command if it is still running."""
+
+        if self._proc is not None:
+            await terminate_process(self._proc)
+        elif self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._record()
+
+    def _entry(self) -> dict:
+        return {"type": "shell", "command": self.command, "cwd": self.run_from}
+
+    def _record(self) -> None:
+        # Write the output read so far once, when the stream ends or is closed
+        if self._recorder is None or self.return_code is None:
+            return
+        self._recorder.write(
+            {
+                **self._entry(),
+                "envs": dict(self.envs),
+                "return_code": self.return_code,
+                "output": b"".join(self._recorded).decode("utf-8", errors="replace"),
+                **({"timed_out": True} if self._timed_out else {}),
+            }
+        )
+        self._recorder = None
+
+    async def _run(self, run: Awaitable[int]) -> int:
+        assert self._queue is not None
+        try:
+            return await run
+        finally:
+            self._queue.put_nowait(b"")  # end of output
+
+    async def __aenter__(self) -> "ShellStream":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def __aiter__(self) -> "ShellStream":
+        return self
+
+    async def __anext__(self) -> str:
+        try:
+            await self.start()
+            if not self._items:
+                if self._deadline is None:
+                    await self._fill()
+                else:
+                    remaining = self._deadline - asyncio.get_event_loop().time()
+                    await asyncio.wait_for(self._fill(), max(remaining, 0))
+            return self._items.popleft()
+        except asyncio.CancelledError:
+            await self.aclose()
+            raise
+        except asyncio.TimeoutError:
+            self._timed_out = True
+            await self.aclose()
+            raise ShellTimeoutError(
+                f"Dony command timed out after {self.timeout:g}s"
+                if self.timeout is not None
+                else "Dony command timed out",
+                command=self.command,
+                return_code=-signal.SIGTERM,
+            ) from None
+
+    async def _fill(self) -> None:
+        while not self._items:
+            if self._eof:
+                await self._finish()
+            await self._read()
+
+    async def _read(self) -> None:
+        if self._proc is not None:
+            assert self._proc.stdout is not None
+            data = await self._proc.stdout.read(CHUNK_SIZE)
+        else:
+            assert self._queue is not None
+            data = await self._queue.get()
+        if self._recorder is not None:
+            self._recorded.append(data)
+        self._eof = not data
+        text = self._decoder.decode(data, final=self._eof)
+
+        # - Chunks mode
+
+        if not self.lines:
+            if text:
+                self._items.append(text)
+            return
+
+        # - Lines mode: split off complete lines, keep the rest for the next chunk
+
+        text = self._partial_line + text
+        *lines, self._partial_line = text.split("\n")
+        self._items.extend(lines)
+        if self._eof and self._partial_line:
+            self._items.append(self._partial_line)
+            self._partial_line = ""
+
+    async def _finish(self) -> None:
+        if self._proc is not None:
+            return_code = await self._proc.wait()
+        else:
+            assert self._task is not None
+            return_code = await self._task
+        self._record()
+        if return_code != 0:
+            raise ShellError(command=self.command, return_code=return_code)
+        raise StopAsyncIteration
+
+
+def shell_stream(
+    command: str,
+    *,
+    run_from: Optional[Union[str, Path]] = None,
+    envs: Optional[Mapping[str, str]] = None,
+    lines: bool = True,
+    errors: str = "replace",
+    abort_on_failure: bool = True,
+    abort_on_unset_variable: bool = True,
+    trace_execution: bool = False,
+    show_command: bool = True,
+    executor: Optional[Executor] = None,
+    timeout: Optional[float] = None,
+) -> ShellStream:
+    """
+    Execute a shell command and iterate over its combined stdout+stderr as it arrives,
+    applying 'set -e', 'set -u' and/or 'set -x' as in `dony.shell`.
+
+    Use it with `async with` so that the command is killed when you stop early:
+
+        async with dony.shell_stream("kubectl logs -f my-pod") as stream:
+            async for line in stream:
+                if "ready" in line:
+                    break
+
+    Args:
+        command: The command line string to execute.
+        run_from: Changes the working directory before executing the command.
+        envs: Extra environment variables to pass to the command (extends current environment).
+        lines: Yields lines without the trailing newline. If False, yields decoded chunks as they arrive.
+        errors: How to handle output that is not valid UTF-8 ("replace", "ignore", "strict", ...).
+        abort_on_failure: Prepends 'set -e' (aborts on first command error).
+        abort_on_unset_variable: Prepends 'set -u' (aborts on unset variable).
+        trace_execution: Prepends 'set -x' (traces command execution at shell level).
+        show_command: Shows the formatted command before executing it.
+        executor: Runs the command with this `dony.Executor`, e.g. a `dony.SSHExecutor`.
+                  Defaults to the one set with `dony.use_executor`, or a new local process.
+        timeout: Seconds the command may run, from its start until the stream is exhausted.
+                 0 for no timeout. Defaults to the one set with `dony.configure_shell`
+                 or `DONY_TIMEOUT`.
+
+    Like `dony.shell`, the stream is recorded by `dony.record` (the output read until it ends or
+    is closed) and served from the trace by `dony.replay`.
+
+    Raises:
+        ShellError: When iteration reaches the end and the command exited with a non-zero status.
+        ShellTimeoutError: When the command runs longer than its timeout (a `ShellError` subclass).
+        ReplayError: In replay mode, when the command is not in the trace.
+    """
+
+    return ShellStream(
+        command,
+        run_from=run_from,
+        envs=envs,
+        lines=lines,
+        errors=errors,
+        abort_on_failure=abort_on_failure,
+        abort_on_unset_variable=abort_on_unset_variable,
+        trace_execution=trace_execution,
+        show_command=show_command,
+        executor=executor,
+        timeout=timeout,
+    )
+
+
+async def example():
+    # - Iterate over lines
+
+    lines = [
+        line async for line in shell_stream("printf 'a\\nb\\nc'", show_command=False)
+    ]
+    assert lines == ["a", "b", "c"], lines
+
+    # - Stop early: the command is killed
+
+    async with shell_stream("while true; do echo tick; sleep 0.1; done") as stream:
+        async for line in stream:
+            print(line)
+            break
+    assert stream.return_code is not None
+
+    # - Cancel while waiting for output
+
+    async def consume():
+        async for _ in shell_stream("sleep 100", show_command=False):
+            pass
+
+    task = asyncio.ensure_future(consume())
+    await asyncio.sleep(0.2)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    # - Timeout: the command is killed
+
+    try:
+        async for _ in shell_stream("sleep 100", show_command=False, timeout=0.2):
+            pass
+        raise Exception("Should have failed")
+    except ShellTimeoutError:
+        pass
+
+    # - Through an executor
+
+    from dony.session import Session
+
+    async with Session() as session:
+        lines = [
+            line
+            async for line in shell_stream(
+                "cd /tmp && echo a && pwd", executor=session, show_command=False
+            )
+        ]
+        assert lines == ["a", "/tmp"], lines
+
+    # - Record and replay
+
+    import tempfile
+
+    from dony.recording import record, replay
+
+    with tempfile.TemporaryDirectory() as directory:
+        trace = Path(directory) / "trace.jsonl"
+        with record(trace):
+            async for _ in shell_stream("echo recorded", show_command=False):
+                pass
+        with replay(trace):
+            lines = [
+                line async for line in shell_stream("echo recorded", show_command=False)
+            ]
+            assert lines == ["recorded"], lines
+
+    # - Failures raise at the end
+
+    try:
+        async for line in shell_stream("echo partial && false", show_command=False):
+            print(line)
+        raise Exception("Should have failed")
+    except ShellError:
+        pass
+
+
+if __name__ == "__main__":
+    asyncio.run(example())
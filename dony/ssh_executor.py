@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import asyncio
+import shutil
+from pathlib import Path
+from typing import List, Mapping, Optional, Sequence, Union
+
+from dony.executor import Executor
+from dony.output_reader import OutputReader
+from dony.session import Session
+
+
+class SSHExecutor(Executor):
+    """
+    Runs commands on a remote host in persistent shells over one SSH connection.
+
+    A first shell opens the connection as an OpenSSH control master and stays idle, the shells
+    that run commands are multiplexed over it, so commands skip both the connection handshake
+    and shell startup. Stopping a command (e.g. on a timeout) drops only its own shell.
+    Like in `dony.Session`, working directory and exported variables carry over between
+    commands of the same shell.
+
+    Usage:
+        async with dony.SSHExecutor("deploy@web-1", sessions=4) as executor:
+            await executor.shell("cd /srv/app && git pull")
+            await dony.shell("systemctl restart app", executor=executor)
+    """
+
+    def __init__(
+        self,
+        host: str,
+        *,
+        port: Optional[int] = None,
+        options: Sequence[str] = (),
+        sessions: int = 1,
+        ssh: Sequence[str] = ("ssh",),
+    ):
+        """
+        Args:
+            host: Host to connect to, as passed to ssh (`host`, `user@host` or a Host alias from ~/.ssh/config).
+            port: Port to connect to.
+            options: Extra ssh arguments, e.g. ["-i", "~/.ssh/deploy_key"].
+            sessions: Number of remote shells, i.e. how many commands can run at the same time.
+            ssh: Command that starts ssh.
+        """
+
+        if sessions < 1:
+            raise ValueError("sessions must be at least 1")
+
+        self.host = host
+        self.port = port
+        self.options = list(options)
+        self.ssh = list(ssh)
+        self._master: Optional[Session] = None
+        self._sessions: List[Session] = []
+        self._idle: List[Session] = []
+        self._n_sessions = sessions
+        self._control_dir: Optional[str] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    def argv(self) -> List[str]:
+        """Command that starts a remote shell."""
+
+        assert self._control_dir is not None
+        return [
+            *self.ssh,
+            "-T",  # no terminal: the shell reads its script from stdin
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={self._control_dir}/%C",
+            "-o",
+            "ControlPersist=no",
+            *(["-p", str(self.port)] if self.port is not None else []),
+            *self.options,
+            self.host,
+            "bash --noprofile --norc",
+        ]
+
+    async def start(self) -> None:
+        """Open the connection. Called automatically on the first command."""
+
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self._n_sessions)
+
+        async with self._start_lock:
+            if self._master is not None:
+                return
+
+            # - Start the control master and wait until it is connected: shells started
+            #   before that would race to become the master and open their own connections
+
+            import tempfile
+
+            self._control_dir = tempfile.mkdtemp(prefix="dony-ssh-")
+            master = Session(argv=self.argv(), new_session=False)
+            if await master.run("true", OutputReader(quiet=True)) != 0:
+                await master.close()
+                raise RuntimeError(f"Could not connect to {self.host}")
+            self._master = master
+
+            # - Commands run in other shells, which reuse its connection and start on demand
+
+            self._sessions = [
+                Session(argv=self.argv(), new_session=False)
+                for _ in range(self._n_sessions)
+            ]
+            self._idle = list(self._sessions)
+
+    async def run(
+        self,
+        command: str,
+        reader: OutputReader,
+        *,
+        stderr_reader: Optional[OutputReader] = None,
+        run_from: Optional[Union[str, Path]] = None,
+        envs: Optional[Mapping[str, str]] = None,
+        new_session: bool = False,
+    ) -> int:
+        await self.start()
+        assert self._semaphore is not None
+
+        async with self._semaphore:
+            session = self._idle.pop(0)
+            try:
+                return await session.run(
+                    command,
+                    reader,
+                    run_from=run_from,
+                    envs=envs,
+                )
+            finally:
+                self._idle.append(session)
+
+    async def close(self) -> None:
+        """Stop the remote shells and close the connection."""
+
+        for session in self._sessions:
+            await session.close()
+        self._sessions = []
+        self._idle = []
+
+        # The master goes last, as the other shells use its connection
+        if self._master is not None:
+            await self._master.close()
+            self._master = None
+
+        if self._control_dir is not None:
+            shutil.rmtree(self._control_dir, ignore_errors=True)
+            self._control_dir = None
+
+    async def __aenter__(self) -> "SSHExecutor":
+        await self.start()
+        return self
+
+
+def test():
+    import stat
+    import tempfile
+
+    from dony.shell import ShellTimeoutError
+    from dony.shell_stream import shell_stream
+
+    with tempfile.TemporaryDirectory() as directory:
+        # - A fake ssh that logs its connections and runs the remote command locally
+
+        log = Path(directory) / "ssh.log"
+        fake_ssh = Path(directory) / "ssh"
+        fake_ssh.write_text(
+            f"""#!/bin/sh
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -T) shift ;;
+    -o|-p) shift 2 ;;
+    *) break ;;
+  esac
+done
+echo "$1" >> {log}
+shift
+exec sh -c "$*"
+"""
+        )
+        fake_ssh.chmod(fake_ssh.stat().st_mode | stat.S_IEXEC)
+
+        async def main() -> None:
+            async with SSHExecutor(
+                "web-1", sessions=2, ssh=[str(fake_ssh)]
+            ) as executor:
+                assert executor._master is not None
+                master = executor._master._proc
+                assert master is not None
+
+                # - Concurrent commands, through dony.shell and dony.shell_stream
+
+                outputs = await asyncio.gather(
+                    *(executor.shell(f"echo {i}", quiet=True) for i in range(4))
+                )
+                assert outputs == ["0", "1", "2", "3"], outputs
+                lines = [
+                    line
+                    async for line in shell_stream(
+                        "echo a; echo b", executor=executor, show_command=False
+                    )
+                ]
+                assert lines == ["a", "b"], lines
+
+                # - A timed out command drops its own shell, not the master
+
+                try:
+                    await executor.shell("sleep 10", timeout=0.2, quiet=True)
+                    raise Exception("Should have failed")
+                except ShellTimeoutError:
+                    pass
+                assert master.returncode is None
+                assert await executor.shell("echo still up", quiet=True) == "still up"
+
+            # - One connection each for the master and the two command shells
+
+            assert log.read_text().split() == ["web-1"] * 3, log.read_text()
+            assert master.returncode is not None
+
+        asyncio.run(main())
+
+
+async def example():
+    async with SSHExecutor("localhost", sessions=2) as executor:
+        # - Commands run concurrently in two remote shells over one connection
+
+        outputs = await asyncio.gather(
+            *(executor.shell(f"echo {i} from $(hostname)") for i in range(4))
+        )
+        print(outputs)
+
+
+if __name__ == "__main__":
+    asyncio.run(example())
@@ -0,0 +1,123 @@
+import asyncio
+import re
+from typing import Any, Callable, Optional, Pattern, Union
+
+ACTIONS = ("notify", "stop", "raise")
+
+
+class Watcher:
+    """
+    Watches the output of a `dony.shell` command, line by line, for a pattern.
+
+    On the first matching line the watcher resolves its future and calls its callback. Depending
+    on `action`, it also stops the command (`dony.shell` then returns the output so far) or fails it.
+
+    Usage:
+        ready = dony.Watcher(r"listening on port (\\d+)")
+        server = asyncio.ensure_future(dony.shell("npm run dev", watch=[ready]))
+        port = (await ready.wait()).group(1)
+        await dony.shell(f"pytest --base-url http://localhost:{port}")
+        server.cancel()  # kills the dev server
+    """
+
+    def __init__(
+        self,
+        pattern: Union[str, Pattern[str], Callable[[str], Any]],
+        *,
+        action: str = "notify",
+        callback: Optional[Callable[[Any], None]] = None,
+    ):
+        """
+        Args:
+            pattern: A regex (searched in each line) or a function that takes a line and returns
+                     a truthy value on a match.
+            action: What happens on a match besides resolving the future:
+                    "notify" (nothing), "stop" (terminate the command and return its output so far)
+                    or "raise" (terminate the command and raise `dony.ShellError`).
+            callback: Called with the match: a `re.Match` for regexes, else the return value
+                      of the function.
+        """
+
+        if action not in ACTIONS:
+            raise ValueError(f"action must be one of {', '.join(ACTIONS)}")
+
+        self.pattern = pattern
+        self.action = action
+        self.callback = callback
+        self._search: Callable[[str], Any] = (
+            re.compile(pattern).search
+            if isinstance(pattern, (str, re.Pattern))
+            else pattern
+        )
+        self._future: Optional["asyncio.Future[Any]"] = None
+
+    def __repr__(self) -> str:
+        return f"Watcher({self.pattern!r}, action={self.action!r})"
+
+    @property
+    def future(self) -> "asyncio.Future[Any]":
+        """Resolves to the match, or to None if the command finished without one."""
+
+        if self._future is None:
+            self._future = asyncio.get_event_loop().create_future()
+        return self._future
+
+    @property
+    def matched(self) -> bool:
+        return self.future.done() and self.future.result() is not None
+
+    async def wait(self) -> Any:
+        """Wait for the match. Returns None if the command finished without one."""
+        return await self.future
+
+    def feed(self, line: str) -> bool:
+        """Check a line. Returns True on the first match."""
+
+        if self.future.done():
+            return False
+
+        match = self._search(line)
+        if not match:
+            return False
+
+        self.future.set_result(match)
+        if self.callback is not None:
+            self.callback(match)
+        return True
+
+    def finish(self) -> None:
+        """Called when the command has finished: an unmatched watcher resolves to None."""
+
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+async def example():
+    from dony.shell import shell
+
+    # - Wait for a background command to be ready
+
+    ready = Watcher(r"ready on port (\d+)")
+    server = asyncio.ensure_future(
+        shell(
+            "sleep 0.2; echo 'ready on port 8000'; sleep 100",
+            watch=[ready],
+            show_command=False,
+        )
+    )
+    assert (await ready.wait()).group(1) == "8000"
+    server.cancel()
+
+    # - Stop on a match
+
+    output = await shell(
+        "for i in $(seq 1 100); do echo $i; sleep 0.01; done",
+        until=r"^3$",
+        quiet=True,
+        show_command=False,
+    )
+    assert output == "1\n2\n3", output
+
+
+if __name__ == "__main__":
+    asyncio.run(example())